@@ -2,26 +2,32 @@
 Analysis tool for exploring generated experiments
 """
 
-import json
+import heapq
+
+from experiment_io import find_dataset, iter_dataset
+from experiment_store import ExperimentStore
 
 def load_experiments():
-    with open('climate_experiments.json', 'r') as f:
-        return json.load(f)
+    return list(iter_dataset(find_dataset() or 'climate_experiments.json'))
+
+def load_store():
+    """Load the dataset into an indexed ExperimentStore (memory-mapped for .ecol files)"""
+    return ExperimentStore.load(find_dataset() or 'climate_experiments.json')
 
 def filter_experiments(experiments, **filters):
     """Filter experiments by criteria"""
-    results = experiments
-    
-    for key, value in filters.items():
-        if value:
-            results = [e for e in results if e.get(key) == value]
+    if isinstance(experiments, ExperimentStore):
+        return experiments.records(experiments.iter_rows(experiments.match(**filters)))
     
-    return results
+    active = [(key, value) for key, value in filters.items() if value]
+    return [e for e in experiments if all(e.get(key) == value for key, value in active)]
 
 def top_roi_experiments(experiments, n=10):
     """Get top N experiments by ROI"""
-    sorted_exp = sorted(experiments, key=lambda x: x['expected_roi'], reverse=True)
-    return sorted_exp[:n]
+    if isinstance(experiments, ExperimentStore):
+        rows = experiments.sorted_rows(experiments.match(), 'expected_roi', reverse=True, limit=n)
+        return experiments.records(rows)
+    return heapq.nlargest(n, experiments, key=lambda x: x['expected_roi'])
 
 def high_priority_experiments(experiments):
     """Get all high priority experiments"""
@@ -29,6 +35,9 @@ def high_priority_experiments(experiments):
 
 def experiments_by_budget(experiments, max_budget):
     """Get experiments within budget"""
+    if isinstance(experiments, ExperimentStore):
+        rows = experiments.iter_rows(experiments.range_bitmap('cost_estimate_ngn', high=max_budget))
+        return experiments.records(rows)
     return [e for e in experiments if e['cost_estimate_ngn'] <= max_budget]
 
 def print_experiment(exp):
@@ -55,7 +64,7 @@ def print_experiment(exp):
 
 def main():
     print("Loading experiments...")
-    experiments = load_experiments()
+    experiments = load_store()
     print(f"✓ Loaded {len(experiments)} experiments\n")
     
     # Analysis examples
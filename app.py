@@ -2,95 +2,416 @@
 Flask web application for Climate Experiment Explorer
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, g
+from itertools import chain, islice
+import base64
+import hmac
 import json
+import math
 import os
 import sys
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from experiment_io import dataset_version, find_dataset
+from experiment_store import ExperimentStore
+from json_encoding import FastJSONProvider, compress_response, dumps
+from live_dataset import LiveDataset
+from response_cache import ResponseCache, cached_json, send_cached
+from facet_index import MEASURES, facets
+from search_index import parse_query
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+
+class generation_lock:
+    """Exclusive lock so only one process (e.g. one Gunicorn worker) generates the dataset"""
+    
+    def __init__(self, path='.climate_experiments.lock'):
+        self.path = path
+    
+    def __enter__(self):
+        self.file = open(self.path, 'w')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+    
+    def __exit__(self, *exc):
+        self.file.close()
 
 # Auto-generate experiments if they don't exist
-def ensure_experiments_exist():
-    """Generate experiments if JSON files don't exist"""
-    if not os.path.exists('climate_experiments.json'):
-        print("Generating experiments (first run)...")
-        # Import and run the generator
-        sys.path.insert(0, os.path.dirname(__file__))
-        from climate_experiment_generator import ClimateExperimentGenerator
-        
-        generator = ClimateExperimentGenerator()
-        experiments = generator.generate_experiments(500)
-        generator.save_experiments(experiments, 'climate_experiments.json')
-        
-        summary = generator.generate_summary_report(experiments)
-        with open('experiment_summary.json', 'w') as f:
-            json.dump(summary, f, indent=2)
-        
-        print("✓ Experiments generated successfully!")
-        return experiments, summary
+def ensure_experiments_exist(previous=None):
+    """Generate experiments if no dataset file exists, then load it into the store
+
+    With the `previous` snapshot, a dataset that has only gained appended
+    segments extends a copy of its store instead of being loaded again.
+    """
+    with generation_lock():
+        dataset = find_dataset()
+        if dataset is None:
+            print("Generating experiments (first run)...")
+            # Import and run the generator
+            sys.path.insert(0, os.path.dirname(__file__))
+            from climate_experiment_generator import ClimateExperimentGenerator
+            
+            # The writer swaps the finished file in, so no reader ever sees a half-written dataset
+            dataset = 'climate_experiments.json'
+            generator = ClimateExperimentGenerator()
+            summary = generator.stream_experiments(dataset, 500)
+            with open('experiment_summary.json', 'w') as f:
+                json.dump(summary, f, indent=2)
+            
+            print("✓ Experiments generated successfully!")
+        else:
+            with open('experiment_summary.json', 'r') as f:
+                summary = json.load(f)
+    
+    if previous is not None:
+        store = previous.store.refreshed(dataset)
     else:
-        # Load existing experiments
-        with open('climate_experiments.json', 'r') as f:
-            experiments = json.load(f)
-        with open('experiment_summary.json', 'r') as f:
-            summary = json.load(f)
-        return experiments, summary
+        # Memory-map columnar files; stream JSON records into the store without a list of dicts
+        store = ExperimentStore.load(dataset)
+    
+    # Build the search and facet indexes here, off the request path; range filter
+    # indexes come prebuilt in columnar files and are otherwise built per field on first use
+    store.search_index()
+    for field, scale in MEASURES.items():
+        store.measure_index(field, scale)
+    return store, summary
+
+# Upper bound on IDs accepted by the batch endpoint
+MAX_BATCH_IDS = 500
+
+def current_dataset_version():
+    """Version of the dataset file on disk, or None if there is none yet"""
+    dataset = find_dataset()
+    return dataset_version(dataset) if dataset else None
+
+# Serialized responses, keyed by dataset version so regenerated data is never served stale
+RESPONSE_CACHE = ResponseCache(int(os.environ.get('RESPONSE_CACHE_MB', 64)) * 1024 * 1024)
+
+# Encoded JSON of individual experiments, shared by the detail and batch endpoints
+RECORD_CACHE = ResponseCache(int(os.environ.get('RECORD_CACHE_MB', 32)) * 1024 * 1024)
+
+def drop_cached_responses(snapshot):
+    RESPONSE_CACHE.clear()
+    RECORD_CACHE.clear()
+
+# Loaded or generated in a background thread; requests get a 503 until it is ready.
+# A rewritten dataset file is picked up every DATASET_WATCH_INTERVAL seconds (0 turns this off).
+DATASET = LiveDataset(ensure_experiments_exist, current_dataset_version,
+                      watch_interval=float(os.environ.get('DATASET_WATCH_INTERVAL', 5)),
+                      on_swap=drop_cached_responses)
+
+# Token for the admin endpoints; they are disabled when it is unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Endpoints that answer while the dataset is still loading
+NO_DATASET_ENDPOINTS = {'index', 'static', 'healthz', 'reload_dataset'}
+
+def cached(*headers):
+    return cached_json(RESPONSE_CACHE, lambda: g.snapshot.store.version, headers)
+
+def encoded_record(store, row):
+    """Cache entry holding the serialized JSON of one experiment"""
+    key = (store.version, 'record', row)
+    entry = RECORD_CACHE.get(key)
+    if entry is None:
+        entry = RECORD_CACHE.put(key, dumps(store.record(row)))
+    return entry
+
+@app.before_request
+def require_dataset():
+    """Pin the request to the current snapshot, or answer with a fast 503 until there is one
+
+    A reload swaps in a new snapshot without affecting requests that
+    already hold the old one.
+    """
+    DATASET.start()
+    g.snapshot = DATASET.snapshot
+    if g.snapshot is not None or request.endpoint in NO_DATASET_ENDPOINTS:
+        return None
+    response = jsonify({'error': 'Experiment data is still loading', **DATASET.status()})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
+
+@app.after_request
+def compress_json(response):
+    return compress_response(response, request)
+
+def encode_cursor(offset):
+    """Encode a result offset as an opaque paging cursor"""
+    token = json.dumps({'offset': offset}).encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a paging cursor back into an offset, or None if it is invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))['offset']
+    except (ValueError, TypeError, KeyError):
+        return None
+    return offset if isinstance(offset, int) and offset >= 0 else None
+
+class BadRequest(ValueError):
+    """Invalid query parameters, reported to the client as a 400"""
+
+@app.errorhandler(BadRequest)
+def bad_request(error):
+    return jsonify({'error': str(error)}), 400
+
+# Categorical filter parameters -> store field
+FILTER_PARAMS = {
+    'segment': 'user_segment',
+    'region': 'region',
+    'event': 'climate_event',
+    'channel': 'alert_channel',
+    'priority': 'priority'
+}
+
+# Range filter parameters (min_<name> / max_<name>) -> (store field, value type)
+RANGE_PARAMS = {
+    'roi': ('expected_roi', float),
+    'cost': ('cost_estimate_ngn', int),
+    'sample_size': ('sample_size', int),
+    'duration': ('duration_days', int),
+    'lead_time': ('lead_time_hours', int),
+    'accuracy': ('predicted_accuracy', float)
+}
 
-# Load or generate experiments on startup
-EXPERIMENTS, SUMMARY = ensure_experiments_exist()
+def request_filters():
+    """Filters from the query string, as keyword arguments for ExperimentStore.match
+
+    Categorical parameters take one value or a comma-separated list
+    (`region=Lagos,Kano`); min_/max_ parameters bound numeric fields.
+    """
+    filters = {}
+    for param, field in FILTER_PARAMS.items():
+        values = [v for v in request.args.get(param, '').split(',') if v]
+        if values:
+            filters[field] = values
+    
+    ranges = {}
+    for name, (field, kind) in RANGE_PARAMS.items():
+        bounds = []
+        for param in (f'min_{name}', f'max_{name}'):
+            value = request.args.get(param)
+            try:
+                bound = kind(value) if value else None
+                # float() accepts nan and inf, which would quietly disable the filter
+                if bound is not None and not math.isfinite(bound):
+                    raise ValueError(value)
+            except ValueError:
+                raise BadRequest(f'{param} must be a number') from None
+            bounds.append(bound)
+        if bounds != [None, None]:
+            ranges[field] = tuple(bounds)
+    filters['ranges'] = ranges
+    return filters
+
+def request_page(default_limit=None):
+    """(offset, limit, fields) from the limit/offset/cursor/fields parameters"""
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else default_limit
+        offset = int(request.args['offset']) if request.args.get('offset') else 0
+    except ValueError:
+        raise BadRequest('limit and offset must be whole numbers') from None
+    cursor = request.args.get('cursor')
+    if cursor:
+        offset = decode_cursor(cursor)
+        if offset is None:
+            raise BadRequest('Invalid cursor')
+    if offset < 0 or (limit is not None and limit < 0):
+        raise BadRequest('limit and offset must not be negative')
+    
+    fields = None
+    if request.args.get('fields'):
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in g.snapshot.store.fields]
+        if unknown:
+            raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    return offset, limit, fields
+
+def page_response(store, rows, end, total, fields):
+    """JSON list of one page of rows, ending at result `end`, with X-Total-Count / X-Next-Cursor headers"""
+    response = jsonify(store.records(rows, fields))
+    response.headers['X-Total-Count'] = str(total)
+    if end < total:
+        response.headers['X-Next-Cursor'] = encode_cursor(end)
+    return response
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/healthz')
+def healthz():
+    """Readiness check: 200 once the dataset is loaded, 503 before that"""
+    status = DATASET.status()
+    return jsonify(status), 200 if status['status'] == 'ready' else 503
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_dataset():
+    """Load the dataset file again in the background and swap it in when ready
+
+    Requires `Authorization: Bearer <ADMIN_TOKEN>`.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (ADMIN_TOKEN is not set)'}), 404
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    started = DATASET.reload()
+    return jsonify({'reload_started': started, **DATASET.status()}), 202
+
 @app.route('/api/experiments')
+@cached('X-Total-Count', 'X-Next-Cursor')
 def get_experiments():
-    """Get all experiments with optional filters"""
-    filters = {
-        'user_segment': request.args.get('segment'),
-        'region': request.args.get('region'),
-        'climate_event': request.args.get('event'),
-        'alert_channel': request.args.get('channel'),
-        'priority': request.args.get('priority')
-    }
-    
-    # Filter experiments
-    results = EXPERIMENTS
-    for key, value in filters.items():
-        if value:
-            results = [e for e in results if e.get(key) == value]
-    
-    # Sort by ROI if requested
+    """Get experiments with optional filters, sorting, paging and projection
+
+    Paging uses `limit` with either `offset` or the opaque `cursor` returned
+    in the `X-Next-Cursor` header; `X-Total-Count` carries the number of
+    matching experiments. `fields` is a comma-separated list of fields to
+    return for each experiment.
+    """
+    # Paging and projection
+    offset, limit, fields = request_page()
+    
+    # Filter experiments through the bitmap indexes
+    store = g.snapshot.store
+    bitmap = store.match(**request_filters())
+    total = bitmap.bit_count()
+    end = total if limit is None else min(offset + limit, total)
+    
+    # Sort by ROI if requested, walking the precomputed ranking only as far as this page
     sort_by = request.args.get('sort', 'experiment_id')
     reverse = request.args.get('order', 'desc') == 'desc'
     
     if sort_by in ['expected_roi', 'cost_estimate_ngn', 'sample_size']:
-        results = sorted(results, key=lambda x: x.get(sort_by, 0), reverse=reverse)
+        rows = store.sorted_rows(bitmap, sort_by, reverse=reverse, limit=end)
+    else:
+        rows = store.iter_rows(bitmap)
     
-    return jsonify(results)
+    return page_response(store, islice(rows, offset, end), end, total, fields)
+
+@app.route('/api/search')
+@cached('X-Total-Count', 'X-Next-Cursor')
+def search_experiments():
+    """Full-text search over hypotheses, success metrics, actions and data sources
+
+    `q` holds words that must all match; `OR` between words makes them
+    alternatives (`flood OR drought sms`). Results can be narrowed with the
+    same filters as /api/experiments and come back best match first, or in
+    `sort` order, paged like /api/experiments (50 per page by default).
+    """
+    groups = parse_query(request.args.get('q', ''))
+    if not groups:
+        raise BadRequest('Expected a search query in q')
+    offset, limit, fields = request_page(default_limit=50)
+    
+    store = g.snapshot.store
+    index = store.search_index()
+    bitmap = index.match(groups) & store.match(**request_filters())
+    total = bitmap.bit_count()
+    end = total if limit is None else min(offset + limit, total)
+    
+    sort_by = request.args.get('sort', 'relevance')
+    if sort_by in ['expected_roi', 'cost_estimate_ngn', 'sample_size']:
+        reverse = request.args.get('order', 'desc') == 'desc'
+        rows = islice(store.sorted_rows(bitmap, sort_by, reverse=reverse, limit=end), offset, end)
+    else:
+        # Skip whole score groups that end before the requested page
+        parts, passed, skipped = [], 0, 0
+        for _, part in index.ranked(bitmap, groups):
+            size = part.bit_count()
+            if passed + size <= offset:
+                skipped += size
+            else:
+                parts.append(part)
+            passed += size
+            if passed >= end:
+                break
+        rows = chain.from_iterable(store.iter_rows(part) for part in parts)
+        rows = islice(rows, offset - skipped, end - skipped)
+    
+    return page_response(store, rows, end, total, fields)
+
+@app.route('/api/facets')
+@cached()
+def get_facets():
+    """Counts per dimension and ROI / cost statistics for the experiments matching the filters
+
+    Accepts the same filters as /api/experiments, plus an optional search
+    query `q`. Everything is computed from bitmap indexes, without reading
+    the matching experiments.
+    """
+    store = g.snapshot.store
+    bitmap = store.match(**request_filters())
+    if request.args.get('q'):
+        groups = parse_query(request.args['q'])
+        if groups:
+            bitmap &= store.search_index().match(groups)
+    return jsonify(facets(store, bitmap))
 
 @app.route('/api/summary')
+@cached()
 def get_summary():
     """Get summary statistics"""
-    return jsonify(SUMMARY)
+    return jsonify(g.snapshot.summary)
 
 @app.route('/api/experiment/<exp_id>')
 def get_experiment(exp_id):
     """Get single experiment details"""
-    exp = next((e for e in EXPERIMENTS if e['experiment_id'] == exp_id), None)
-    if exp:
-        return jsonify(exp)
+    store = g.snapshot.store
+    row = store.find(exp_id)
+    if row is not None:
+        return send_cached(RECORD_CACHE, encoded_record(store, row))
     return jsonify({'error': 'Experiment not found'}), 404
 
+@app.route('/api/experiments/batch', methods=['GET', 'POST'])
+def get_experiment_batch():
+    """Get several experiments in one round trip
+
+    IDs come from a JSON body `{"ids": [...]}` or a comma-separated `ids`
+    query parameter. Found experiments are returned in request order, and
+    unknown IDs are listed under `missing`.
+    """
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or {}
+        ids = payload.get('ids') if isinstance(payload, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(exp_id, str) for exp_id in ids):
+            return jsonify({'error': 'Expected a JSON body with an "ids" list of strings'}), 400
+    else:
+        ids = [i for i in request.args.get('ids', '').split(',') if i]
+    
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify({'error': f'At most {MAX_BATCH_IDS} IDs per request'}), 400
+    
+    # Splice the cached per-experiment JSON rather than re-encoding each record
+    store = g.snapshot.store
+    rows = [(exp_id, store.find(exp_id)) for exp_id in ids]
+    experiments = b','.join(encoded_record(store, row).body for _, row in rows if row is not None)
+    missing = dumps([exp_id for exp_id, row in rows if row is None])
+    body = b'{"experiments":[' + experiments + b'],"missing":' + missing + b'}'
+    return app.response_class(body, mimetype='application/json')
+
 @app.route('/api/filters')
+@cached()
 def get_filters():
     """Get available filter options"""
+    counts = {field: g.snapshot.store.counts(field) for field in
+              ['user_segment', 'region', 'climate_event', 'alert_channel', 'priority']}
     return jsonify({
-        'segments': list(set(e['user_segment'] for e in EXPERIMENTS)),
-        'regions': list(set(e['region'] for e in EXPERIMENTS)),
-        'events': list(set(e['climate_event'] for e in EXPERIMENTS)),
-        'channels': list(set(e['alert_channel'] for e in EXPERIMENTS)),
-        'priorities': ['high', 'medium', 'low']
+        'segments': list(counts['user_segment']),
+        'regions': list(counts['region']),
+        'events': list(counts['climate_event']),
+        'channels': list(counts['alert_channel']),
+        'priorities': ['high', 'medium', 'low'],
+        'counts': counts
     })
 
 if __name__ == '__main__':
@@ -105,9 +426,15 @@ if __name__ == '__main__':
     # Check if running in production
     is_production = os.environ.get('RENDER') or os.environ.get('HEROKU')
     
+    # Start loading right away rather than on the first request (in debug mode,
+    # only in the reloader's child process, which is the one serving)
+    if is_production or os.environ.get('WERKZEUG_RUN_MAIN'):
+        DATASET.start()
+    
     if is_production:
+        # Prefer `gunicorn -c gunicorn.conf.py app:app` (see Procfile); this is the fallback
         print(f"Running in production mode on port {port}")
-        app.run(debug=False, host='0.0.0.0', port=port)
+        app.run(debug=False, host='0.0.0.0', port=port, threaded=True)
     else:
         print("Open your browser to: http://localhost:5000")
         print("\nPress CTRL+C to stop the server")
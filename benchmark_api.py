@@ -0,0 +1,85 @@
+"""
+Measure API throughput against a running server
+
+Start the server in one terminal (either mode), then run for example:
+
+    python benchmark_api.py --url http://localhost:5000 --concurrency 16 --requests 2000
+"""
+
+import argparse
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Mix of dashboard traffic: filtered pages, detail views and summary reads
+PATHS = [
+    '/api/experiments?limit=50',
+    '/api/experiments?segment=farmers&sort=expected_roi&limit=50',
+    '/api/experiments?priority=high&event=flood&limit=50',
+    '/api/summary',
+    '/api/filters',
+]
+
+
+def request_paths(count, max_id, seed=0):
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        if rng.random() < 0.4:
+            paths.append(f'/api/experiment/EXP_{rng.randint(1, max_id):04d}')
+        else:
+            paths.append(rng.choice(PATHS))
+    return paths
+
+
+def fetch(url):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        # 4xx/5xx (e.g. 503 during a reload) are counted as errors, not fatal
+        e.read()
+        status = e.code
+    return status, time.perf_counter() - start
+
+
+def run(base_url, concurrency, count, max_id):
+    urls = [base_url.rstrip('/') + path for path in request_paths(count, max_id)]
+    # Warm up caches so the run measures steady-state serving
+    for url in set(urls[:50]):
+        fetch(url)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    errors = Counter(status for status, _ in results if status != 200)
+    print(f"Requests:     {count} ({sum(errors.values())} errors) with {concurrency} concurrent clients")
+    if errors:
+        print("Error status: " + ", ".join(f"{status} x{n}" for status, n in sorted(errors.items())))
+    print(f"Throughput:   {count / elapsed:.0f} req/s")
+    print(f"Latency p50:  {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"Latency p95:  {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms")
+    print(f"Latency p99:  {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the experiment API")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--max-id', type=int, default=500, help="highest experiment number to request")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.url, args.concurrency, args.requests, args.max_id)
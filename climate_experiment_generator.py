@@ -1,16 +1,44 @@
-
-
 """
 Hyperlocal Climate Intelligence - Experiment Scenario Generator
 Generates 500 diverse experimental scenarios for testing the platform
 """
 
+import argparse
+import os
 import random
 import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from itertools import product
+from functools import cached_property
+from itertools import islice, product
+
+from experiment_io import (ExperimentWriter, compact_dataset, find_dataset, find_segments,
+                           iter_records, next_segment_path, remove_segments)
+from experiment_summary import SummaryAccumulator
+
+
+# Output format -> dataset file extension
+FORMAT_EXTENSIONS = {'json': 'json', 'ndjson': 'ndjson', 'binary': 'ecol'}
+
+# Experiments per seeded shard; output depends only on the master seed and this size
+SHARD_SIZE = 10000
+
+# Appending compacts the dataset once it has this many segments
+MAX_SEGMENTS = 16
+
 
+def _generate_shard(task):
+    """Process-pool worker: build one shard of experiments from its own seeded RNG
 
+    Returns the experiments together with their partial summary, so the
+    parent only has to merge summaries.
+    """
+    generator, seed, shard, start_id, count = task
+    rng = random.Random(f'{seed}:{shard}')
+    experiments = [generator._create_experiment(start_id + i, rng) for i in range(count)]
+    return experiments, SummaryAccumulator().update_many(experiments)
 
 
 class ClimateExperimentGenerator:
@@ -42,6 +70,53 @@ class ClimateExperimentGenerator:
         
         self.lead_times = [1, 3, 6, 12, 24, 48, 72]  # hours
         
+        self.metrics_map = {
+            'farmers': ['crop_yield_improvement', 'loss_reduction', 'adoption_rate', 'action_compliance'],
+            'insurers': ['claim_accuracy', 'payout_speed', 'fraud_reduction', 'customer_satisfaction'],
+            'government': ['response_time', 'lives_saved', 'resource_efficiency', 'public_trust'],
+            'logistics': ['delivery_success_rate', 'cost_savings', 'route_optimization', 'damage_reduction'],
+            'ngos': ['beneficiary_reach', 'aid_efficiency', 'response_time', 'coordination_improvement']
+        }
+        
+        self.data_sources = ['nimet', 'satellite_imagery', 'iot_sensors', 'crowdsourced', 
+                             'global_models', 'radar', 'weather_stations']
+        
+        self.priorities = ['high', 'medium', 'low']
+        
+        self.ml_models = ['random_forest', 'lstm', 'gradient_boosting', 'ensemble']
+        
+        self.validation_methods = ['cross_validation', 'holdout', 'time_series_split']
+        
+        # Hypothesis templates; accuracy is filled in as a percentage
+        self.hypothesis_templates = [
+            "Delivering {event} alerts via {channel} to {segment} with {accuracy}% accuracy will increase preparedness by 30%",
+            "{segment} receiving {event} warnings through {channel} will reduce losses by 40%",
+            "Early {event} detection for {segment} via {channel} improves decision-making response time by 50%",
+            "{channel}-based alerts for {event} will increase {segment} platform adoption by 25%"
+        ]
+    
+    @cached_property
+    def hypotheses(self):
+        """Every distinct hypothesis, rendered once and interned
+
+        Keyed by (template index, segment, event, channel, accuracy), in
+        that product order. Experiments share these string objects, so a
+        batch holds one copy of each hypothesis however many rows use it.
+        """
+        return {
+            (index, segment, event, channel, accuracy): sys.intern(
+                template.format(segment=segment, event=event, channel=channel, accuracy=accuracy * 100))
+            for (index, template), segment, event, channel, accuracy in product(
+                enumerate(self.hypothesis_templates), self.user_segments, self.climate_events,
+                self.alert_channels, self.accuracy_levels)
+        }
+    
+    def __getstate__(self):
+        # Worker processes rebuild the hypothesis table rather than receive it with every shard
+        state = self.__dict__.copy()
+        state.pop('hypotheses', None)
+        return state
+        
     def generate_experiments(self, num_experiments=500):
         """Generate diverse experimental scenarios"""
         experiments = []
@@ -52,16 +127,127 @@ class ClimateExperimentGenerator:
         
         return experiments
     
-    def _create_experiment(self, exp_id):
+    def iter_experiments(self, num_experiments=500, chunk_size=10000, first_id=1):
+        """Yield experiments in lists of at most chunk_size, so callers never hold them all"""
+        for start in range(0, num_experiments, chunk_size):
+            end = min(start + chunk_size, num_experiments)
+            yield [self._create_experiment(first_id + i) for i in range(start, end)]
+    
+    def generate_experiments_parallel(self, num_experiments=500, workers=None, seed=None):
+        """Generate experiments on a process pool, reproducibly for a given seed"""
+        experiments = []
+        for shard in self.iter_experiments_parallel(num_experiments, workers, seed):
+            experiments.extend(shard)
+        return experiments
+    
+    def iter_experiments_parallel(self, num_experiments=500, workers=None, seed=None):
+        """Yield shards of experiments generated across worker processes
+
+        The ID range is cut into SHARD_SIZE blocks and each block draws from
+        its own random.Random seeded from the master seed and the block
+        number, so the output is identical for any worker count. Shards are
+        yielded in experiment_id order, with at most two per worker in flight.
+        """
+        for experiments, _ in self._iter_shards(num_experiments, workers, seed):
+            yield experiments
+    
+    def _iter_shards(self, num_experiments, workers, seed, first_id=1):
+        """Yield (experiments, summary) pairs per shard, in ID order"""
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        if first_id != 1:
+            # Appended runs must not replay the draws of the run that started at EXP_0001
+            seed = f'{seed}@{first_id}'
+        workers = workers or os.cpu_count() or 1
+        tasks = [(self, seed, shard, first_id + start, min(SHARD_SIZE, num_experiments - start))
+                 for shard, start in enumerate(range(0, num_experiments, SHARD_SIZE))]
+        
+        if workers == 1:
+            for task in tasks:
+                yield _generate_shard(task)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(_generate_shard, task))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    def stream_experiments(self, filename, num_experiments=500, chunk_size=10000,
+                           workers=None, seed=None, backend='python', first_id=1):
+        """Generate experiments straight to disk and return their summary
+
+        `.ndjson`/`.jsonl` files get one experiment per line, anything else a
+        JSON array. Only one chunk is in memory at a time, and the summary is
+        accumulated in the same pass. Passing `workers` or `seed` generates
+        seeded shards in parallel instead, and backend='numpy' draws each
+        chunk with the vectorized engine. IDs start at `first_id`.
+        """
+        summary = SummaryAccumulator()
+        with ExperimentWriter(filename) as writer:
+            if backend == 'numpy':
+                # Batches go to the writer as codes, never as per-experiment dicts
+                from vectorized_generator import VectorizedGenerator
+                engine = VectorizedGenerator(self)
+                for batch in engine.iter_batches(num_experiments, seed, chunk_size, first_id):
+                    writer.write_batch(engine, batch)
+                    summary.update_batch(batch, engine.vocabularies)
+            else:
+                for chunk, partial in self._iter_summarised_chunks(num_experiments, chunk_size,
+                                                                   workers, seed, first_id):
+                    writer.write_chunk(chunk)
+                    summary.merge(partial)
+        print(f"✓ Saved {writer.count} experiments to {filename}")
+        return summary.to_dict()
+    
+    def _iter_summarised_chunks(self, num_experiments, chunk_size, workers, seed, first_id=1):
+        """Yield (experiments, summary) per chunk of the Python backend"""
+        if workers or seed is not None:
+            # A seed alone picks reproducible shards, not a process pool
+            yield from self._iter_shards(num_experiments, workers or 1, seed, first_id)
+        else:
+            for chunk in self.iter_experiments(num_experiments, chunk_size, first_id):
+                yield chunk, SummaryAccumulator().update_many(chunk)
+    
+    def append_experiments(self, dataset, num_experiments, chunk_size=10000, workers=None,
+                           seed=None, backend='python', summary_file='experiment_summary.json'):
+        """Append experiments to `dataset` as a new NDJSON segment and return the updated summary
+
+        IDs continue from the saved summary's total, and the new experiments'
+        summary is merged into it, so existing files are never read or
+        rewritten. Like every dataset file, the segment only appears once it
+        is complete, and the dataset is compacted once it has MAX_SEGMENTS.
+        """
+        with open(summary_file, 'r') as f:
+            summary = SummaryAccumulator.from_dict(json.load(f))
+        
+        segment = next_segment_path(dataset)
+        added = self.stream_experiments(segment, num_experiments, chunk_size, workers, seed,
+                                        backend, first_id=summary.count + 1)
+        summary.merge(SummaryAccumulator.from_dict(added))
+        
+        with open(summary_file, 'w') as f:
+            json.dump(summary.to_dict(), f, indent=2)
+        print(f"✓ Appended {added['total_experiments']} experiments to {dataset} as {segment}")
+        
+        if len(find_segments(dataset)) >= MAX_SEGMENTS:
+            merged = compact_dataset(dataset)
+            print(f"✓ Compacted {merged} segments into {dataset}")
+        return summary.to_dict()
+    
+    def _create_experiment(self, exp_id, rng=random):
         """Create a single experiment scenario"""
-        user_segment = random.choice(self.user_segments)
-        region = random.choice(self.regions)
-        event = random.choice(self.climate_events)
-        channel = random.choice(self.alert_channels)
-        horizon = random.choice(self.forecast_horizons)
-        accuracy = random.choice(self.accuracy_levels)
-        lead_time = random.choice(self.lead_times)
-        action = random.choice(self.actions[user_segment])
+        user_segment = rng.choice(self.user_segments)
+        region = rng.choice(self.regions)
+        event = rng.choice(self.climate_events)
+        channel = rng.choice(self.alert_channels)
+        horizon = rng.choice(self.forecast_horizons)
+        accuracy = rng.choice(self.accuracy_levels)
+        lead_time = rng.choice(self.lead_times)
+        action = rng.choice(self.actions[user_segment])
         
         # Generate realistic parameters
         experiment = {
@@ -74,46 +260,32 @@ class ClimateExperimentGenerator:
             'predicted_accuracy': accuracy,
             'lead_time_hours': lead_time,
             'recommended_action': action,
-            'hypothesis': self._generate_hypothesis(user_segment, event, channel, accuracy),
-            'success_metrics': self._generate_metrics(user_segment),
-            'sample_size': random.randint(50, 5000),
-            'duration_days': random.randint(7, 90),
-            'cost_estimate_ngn': random.randint(50000, 2000000),
-            'expected_roi': round(random.uniform(1.5, 5.0), 2),
-            'priority': random.choice(['high', 'medium', 'low']),
-            'data_sources': self._select_data_sources(),
-            'ml_model': random.choice(['random_forest', 'lstm', 'gradient_boosting', 'ensemble']),
-            'validation_method': random.choice(['cross_validation', 'holdout', 'time_series_split'])
+            'hypothesis': self._generate_hypothesis(user_segment, event, channel, accuracy, rng),
+            'success_metrics': self._generate_metrics(user_segment, rng),
+            'sample_size': rng.randint(50, 5000),
+            'duration_days': rng.randint(7, 90),
+            'cost_estimate_ngn': rng.randint(50000, 2000000),
+            'expected_roi': round(rng.uniform(1.5, 5.0), 2),
+            'priority': rng.choice(self.priorities),
+            'data_sources': self._select_data_sources(rng),
+            'ml_model': rng.choice(self.ml_models),
+            'validation_method': rng.choice(self.validation_methods)
         }
         
         return experiment
     
-    def _generate_hypothesis(self, segment, event, channel, accuracy):
+    def _generate_hypothesis(self, segment, event, channel, accuracy, rng=random):
         """Generate experiment hypothesis"""
-        templates = [
-            f"Delivering {event} alerts via {channel} to {segment} with {accuracy*100}% accuracy will increase preparedness by 30%",
-            f"{segment} receiving {event} warnings through {channel} will reduce losses by 40%",
-            f"Early {event} detection for {segment} via {channel} improves decision-making response time by 50%",
-            f"{channel}-based alerts for {event} will increase {segment} platform adoption by 25%"
-        ]
-        return random.choice(templates)
+        template = rng.randrange(len(self.hypothesis_templates))
+        return self.hypotheses[template, segment, event, channel, accuracy]
     
-    def _generate_metrics(self, segment):
+    def _generate_metrics(self, segment, rng=random):
         """Define success metrics per segment"""
-        metrics_map = {
-            'farmers': ['crop_yield_improvement', 'loss_reduction', 'adoption_rate', 'action_compliance'],
-            'insurers': ['claim_accuracy', 'payout_speed', 'fraud_reduction', 'customer_satisfaction'],
-            'government': ['response_time', 'lives_saved', 'resource_efficiency', 'public_trust'],
-            'logistics': ['delivery_success_rate', 'cost_savings', 'route_optimization', 'damage_reduction'],
-            'ngos': ['beneficiary_reach', 'aid_efficiency', 'response_time', 'coordination_improvement']
-        }
-        return random.sample(metrics_map[segment], k=random.randint(2, 4))
+        return rng.sample(self.metrics_map[segment], k=rng.randint(2, 4))
     
-    def _select_data_sources(self):
+    def _select_data_sources(self, rng=random):
         """Select data sources for experiment"""
-        sources = ['nimet', 'satellite_imagery', 'iot_sensors', 'crowdsourced', 
-                  'global_models', 'radar', 'weather_stations']
-        return random.sample(sources, k=random.randint(2, 4))
+        return rng.sample(self.data_sources, k=rng.randint(2, 4))
     
     def save_experiments(self, experiments, filename='experiments.json'):
         """Save experiments to JSON file"""
@@ -123,29 +295,32 @@ class ClimateExperimentGenerator:
     
     def generate_summary_report(self, experiments):
         """Generate summary statistics"""
-        summary = {
-            'total_experiments': len(experiments),
-            'by_segment': {},
-            'by_region': {},
-            'by_event': {},
-            'by_channel': {},
-            'avg_sample_size': sum(e['sample_size'] for e in experiments) / len(experiments),
-            'total_estimated_cost': sum(e['cost_estimate_ngn'] for e in experiments),
-            'avg_expected_roi': sum(e['expected_roi'] for e in experiments) / len(experiments),
-            'high_priority_count': sum(1 for e in experiments if e['priority'] == 'high')
-        }
-        
-        # Count by categories
-        for exp in experiments:
-            summary['by_segment'][exp['user_segment']] = summary['by_segment'].get(exp['user_segment'], 0) + 1
-            summary['by_region'][exp['region']] = summary['by_region'].get(exp['region'], 0) + 1
-            summary['by_event'][exp['climate_event']] = summary['by_event'].get(exp['climate_event'], 0) + 1
-            summary['by_channel'][exp['alert_channel']] = summary['by_channel'].get(exp['alert_channel'], 0) + 1
-        
-        return summary
+        return SummaryAccumulator().update_many(experiments).to_dict()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate climate experiment scenarios")
+    parser.add_argument('--count', type=int, default=500, help="number of experiments to generate")
+    parser.add_argument('--chunk-size', type=int,
+                        help="experiments held in memory at once while writing (default: 10000; "
+                             f"the python backend uses {SHARD_SIZE}-experiment shards with --seed/--workers)")
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS), default='json',
+                        help="write a JSON array, one experiment per line, or a memory-mappable columnar file")
+    parser.add_argument('--workers', type=int, help="generate in parallel on this many processes")
+    parser.add_argument('--seed', type=int, help="master seed for reproducible output")
+    parser.add_argument('--backend', choices=['python', 'numpy'], default='python',
+                        help="draw experiments one at a time or in vectorized batches")
+    parser.add_argument('--append', action='store_true',
+                        help="add --count experiments to the newest dataset, continuing its IDs")
+    parser.add_argument('--compact', action='store_true',
+                        help="merge appended segments into the newest dataset and exit")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    output = f'climate_experiments.{FORMAT_EXTENSIONS[args.format]}'
+    
     print("=" * 60)
     print("Hyperlocal Climate Intelligence Platform")
     print("Experiment Scenario Generator")
@@ -154,17 +329,41 @@ def main():
     
     generator = ClimateExperimentGenerator()
     
-    print("Generating 500 experimental scenarios...")
-    experiments = generator.generate_experiments(500)
+    if args.chunk_size is None:
+        args.chunk_size = 10000
+    elif args.backend == 'python' and (args.seed is not None or args.workers):
+        print(f"⚠ --chunk-size is ignored with --seed/--workers: "
+              f"experiments are generated in shards of {SHARD_SIZE}")
     
-    print(f"✓ Generated {len(experiments)} experiments")
-    print()
+    if args.append or args.compact:
+        output = find_dataset()
+        if output is None:
+            print("No dataset found - run without --append/--compact first")
+            return
     
-    # Save to JSON
-    generator.save_experiments(experiments, 'climate_experiments.json')
+    if args.compact:
+        merged = compact_dataset(output)
+        print(f"✓ Compacted {merged} segments into {output}")
+        return
     
-    # Generate summary
-    summary = generator.generate_summary_report(experiments)
+    if args.append:
+        print(f"Appending {args.count} experimental scenarios to {output}...")
+        summary = generator.append_experiments(output, args.count, args.chunk_size,
+                                               workers=args.workers, seed=args.seed,
+                                               backend=args.backend)
+    else:
+        print(f"Generating {args.count} experimental scenarios...")
+        
+        # Segments appended to the previous dataset don't belong to the new one
+        remove_segments(output)
+        
+        # Stream to disk, summarising in the same pass
+        summary = generator.stream_experiments(output, args.count, args.chunk_size,
+                                               workers=args.workers, seed=args.seed,
+                                               backend=args.backend)
+        print(f"✓ Generated {summary['total_experiments']} experiments")
+    experiments = list(islice(iter_records(output), 3))
+    print()
     
     with open('experiment_summary.json', 'w') as f:
         json.dump(summary, f, indent=2)
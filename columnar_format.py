@@ -0,0 +1,195 @@
+"""
+Compact binary columnar format for experiment datasets
+
+File layout (all integers little-endian):
+
+    8 bytes   magic b'EXPCOL01'
+    8 bytes   header length H
+    H bytes   JSON header: row count, field order, vocabularies and the
+              offset/length of every block, relative to the data section
+    padding   to an 8-byte boundary
+    data      8-byte aligned blocks: one per column, plus persisted sort
+              permutations, bitmap indexes, range filter prefix bitmaps
+              and the experiment_id ordering
+
+Opening a file memory-maps it and wraps each block in a memoryview, so
+load time does not grow with the row count and every process that opens
+the same file shares its pages through the OS page cache.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from experiment_io import partial_path
+from experiment_store import (ExperimentStore, INDEXED_FIELDS, LIST_FIELDS, RANGE_FIELDS, SORTABLE_FIELDS,
+                              _as_bitmap, _code_type)
+
+MAGIC = b'EXPCOL01'
+
+_PREFIX = struct.Struct('<8sQ')
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class StringColumn:
+    """Read-only column of strings stored as offsets into a UTF-8 blob"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return str(self.data[self.offsets[row]:self.offsets[row + 1]], 'utf-8')
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class _BlockWriter:
+    """Collects 8-byte aligned data blocks and records where each one lands"""
+
+    def __init__(self):
+        self.blocks = []
+        self.size = 0
+
+    def add(self, data, typecode='B'):
+        data = memoryview(data).cast('B')
+        entry = {'offset': self.size, 'nbytes': data.nbytes, 'typecode': typecode}
+        self.blocks.append(data)
+        padding = _align(data.nbytes) - data.nbytes
+        if padding:
+            self.blocks.append(bytes(padding))
+        self.size += data.nbytes + padding
+        return entry
+
+
+def _as_array(column, typecode):
+    if isinstance(column, array) and column.typecode == typecode:
+        return column
+    return array(typecode, column)
+
+
+def write_columnar(store, filename):
+    """Write an ExperimentStore to a columnar file, replacing any existing one in a single step"""
+    if sys.byteorder != 'little':
+        raise ValueError('Columnar files are little-endian; byteswap support is not implemented')
+
+    size = len(store)
+    blocks = _BlockWriter()
+    header = {'rows': size, 'fields': list(store.fields), 'columns': {},
+              'orders': {}, 'bitmaps': {}, 'ranges': {}, 'id_order': None}
+
+    for field in store.fields:
+        column = store.columns[field]
+        if field in store.vocab:
+            typecode = _code_type(max(len(store.vocab[field]) - 1, 0))
+            entry = blocks.add(_as_array(column, typecode), typecode)
+            entry['kind'] = 'codes'
+            entry['vocab'] = [list(v) if field in LIST_FIELDS else v for v in store.vocab[field]]
+        elif isinstance(column, (array, memoryview)):
+            # Memory-mapped numeric columns are memoryviews, with the typecode as their format
+            entry = blocks.add(column, getattr(column, 'typecode', None) or column.format)
+            entry['kind'] = 'numeric'
+        else:
+            kind = 'strings' if all(isinstance(v, str) for v in column) else 'json'
+            encoded = [(v if kind == 'strings' else json.dumps(v)).encode('utf-8') for v in column]
+            offsets = array('Q', [0])
+            total = 0
+            for value in encoded:
+                total += len(value)
+                offsets.append(total)
+            entry = {'kind': kind, 'offsets': blocks.add(offsets, 'Q'),
+                     'data': blocks.add(b''.join(encoded))}
+        header['columns'][field] = entry
+
+    # Sortable fields get both directions; fields that are only range-filtered just ascending
+    for field in dict.fromkeys([*SORTABLE_FIELDS, *RANGE_FIELDS]):
+        if field in store.columns:
+            directions = [False, True] if field in SORTABLE_FIELDS else [False]
+            permutations = [_as_array(store.order(field, reverse), _code_type(size)) for reverse in directions]
+            header['orders'][field] = [blocks.add(p, p.typecode) for p in permutations]
+
+    nbytes = (size + 7) // 8
+    for field in RANGE_FIELDS:
+        if field in store.columns:
+            prefixes, width = store.range_prefixes(field)
+            header['ranges'][field] = {'width': width, 'prefixes': [
+                blocks.add(_as_bitmap(prefix).to_bytes(nbytes, 'little')) for prefix in prefixes]}
+
+    for field in INDEXED_FIELDS:
+        if field in store.vocab:
+            header['bitmaps'][field] = [blocks.add(bitmap.to_bytes(nbytes, 'little'))
+                                        for bitmap in store.bitmaps(field)]
+
+    if 'experiment_id' in store.columns:
+        ids = store.columns['experiment_id']
+        id_order = array(_code_type(size), sorted(range(size), key=ids.__getitem__))
+        header['id_order'] = blocks.add(id_order, id_order.typecode)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    # Readers may have the current file memory-mapped: write a new file and move it into place
+    partial = partial_path(filename)
+    try:
+        with open(partial, 'wb') as f:
+            f.write(_PREFIX.pack(MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(bytes(_align(f.tell()) - f.tell()))
+            for block in blocks.blocks:
+                f.write(block)
+        os.replace(partial, filename)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def open_columnar(filename):
+    """Memory-map a columnar file as a read-only ExperimentStore"""
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, header_len = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f'{filename} is not an experiment columnar file')
+    header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_len])
+    base = _align(_PREFIX.size + header_len)
+    view = memoryview(mm)
+
+    def block(entry):
+        start = base + entry['offset']
+        return view[start:start + entry['nbytes']].cast(entry['typecode'])
+
+    columns, vocab = {}, {}
+    for field in header['fields']:
+        entry = header['columns'][field]
+        if entry['kind'] == 'strings':
+            columns[field] = StringColumn(block(entry['offsets']), block(entry['data']))
+        elif entry['kind'] == 'json':
+            strings = StringColumn(block(entry['offsets']), block(entry['data']))
+            columns[field] = [json.loads(v) for v in strings]
+        else:
+            columns[field] = block(entry)
+            if entry['kind'] == 'codes':
+                vocab[field] = entry['vocab']
+
+    store = ExperimentStore.from_columns(
+        columns, vocab, header['rows'],
+        orders={field: tuple(block(e) for e in entries) for field, entries in header['orders'].items()},
+        bitmaps={field: [block(e) for e in entries] for field, entries in header['bitmaps'].items()},
+        id_order=block(header['id_order']) if header['id_order'] else None,
+        range_prefixes={field: ([block(e) for e in entry['prefixes']], entry['width'])
+                        for field, entry in header.get('ranges', {}).items()}
+    )
+    # Keep the mapping alive for as long as the store's views are
+    store._mmap = mm
+    return store
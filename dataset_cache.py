@@ -0,0 +1,104 @@
+"""
+On-disk dataset snapshots for the Streamlit playground: served at once, refreshed in the background
+"""
+
+import logging
+import os
+import threading
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait after a failed fetch before trying that dataset again
+RETRY_AFTER = 300
+
+
+class DatasetCache:
+    """Numeric datasets kept as .npz snapshots (one array per column) in `directory`
+
+    `get` returns the snapshot straight away. Once it is older than `ttl`
+    seconds, a background thread fetches a fresh copy and replaces the
+    file (stale-while-revalidate), so a slow or unreachable source never
+    holds up a page. With no snapshot yet, the fallback is served while the
+    first fetch runs; it is snapshotted as `<name>_fallback` like any other
+    dataset, so it stays the same data until the real one arrives. Without
+    a fallback, that first fetch is waited for.
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self.errors = {}
+        self._failed_at = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{name}.npz')
+
+    def age(self, name):
+        """Seconds since the snapshot was written, or None if there is none"""
+        try:
+            return time.time() - os.path.getmtime(self.path(name))
+        except OSError:
+            return None
+
+    def read(self, name):
+        try:
+            with np.load(self.path(name)) as snapshot:
+                return pd.DataFrame({column: snapshot[column] for column in snapshot.files})
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile) as exc:
+            log.warning("Ignoring unreadable snapshot %s: %s", self.path(name), exc)
+            return None
+
+    def write(self, name, df):
+        """Replace the snapshot in one step, so readers never see a partial file"""
+        os.makedirs(self.directory, exist_ok=True)
+        partial = os.path.join(self.directory, f'{name}.{os.getpid()}.partial.npz')
+        np.savez(partial, **{column: df[column].to_numpy() for column in df.columns})
+        os.replace(partial, self.path(name))
+
+    def get(self, name, fetch, fallback=None):
+        df = self.read(name)
+        if df is None and fallback is None:
+            df = fetch()
+            self.write(name, df)
+            return df
+        age = self.age(name)
+        if df is None or age is None or age > self.ttl:
+            self.refresh(name, fetch)
+        return df if df is not None else self.get(f'{name}_fallback', fallback)
+
+    def refresh(self, name, fetch):
+        """Fetch `name` again in a background thread; returns False if one is running or it failed recently"""
+        with self._lock:
+            thread = self._threads.get(name)
+            if thread is not None and thread.is_alive():
+                return False
+            if time.monotonic() - self._failed_at.get(name, -RETRY_AFTER) < RETRY_AFTER:
+                return False
+            thread = threading.Thread(target=self._refresh, args=(name, fetch),
+                                      name=f'refresh-{name}', daemon=True)
+            self._threads[name] = thread
+            thread.start()
+            return True
+
+    def _refresh(self, name, fetch):
+        started = time.monotonic()
+        try:
+            df = fetch()
+            self.write(name, df)
+        except Exception as exc:
+            log.exception("Refreshing dataset %s failed", name)
+            self.errors[name] = f'{type(exc).__name__}: {exc}'
+            self._failed_at[name] = time.monotonic()
+            return
+        self.errors.pop(name, None)
+        self._failed_at.pop(name, None)
+        log.info("Refreshed dataset %s (%d rows) in %.2fs", name, len(df), time.monotonic() - started)
@@ -0,0 +1,237 @@
+"""
+Streaming readers and writers for experiment dataset files
+"""
+
+import json
+import os
+import re
+from itertools import islice
+
+# Dataset files the tools look for, newest wins
+DATASET_FILES = ['climate_experiments.ecol', 'climate_experiments.ndjson', 'climate_experiments.json']
+
+_SEPARATORS = re.compile(r'[\s,]*')
+
+# Appended experiments live next to their dataset as <dataset>.segNNNN.ndjson
+_SEGMENT = re.compile(r'\.seg(\d+)\.ndjson$')
+
+
+def find_dataset(candidates=None):
+    """Path of the most recently written dataset file, or None"""
+    existing = [path for path in (candidates or DATASET_FILES) if os.path.exists(path)]
+    if not existing:
+        return None
+    return max(existing, key=os.path.getmtime)
+
+
+def file_version(filename):
+    """Version stamp for one file that changes whenever it is rewritten"""
+    stat = os.stat(filename)
+    return f'{os.path.basename(filename)}:{stat.st_mtime_ns:x}:{stat.st_size:x}'
+
+
+def combine_versions(stamps):
+    """Version of a dataset from the stamps of its main file and appended segments"""
+    if len(stamps) == 1:
+        return stamps[0]
+    return f'{stamps[0]}+{len(stamps) - 1}:{stamps[-1]}'
+
+
+def dataset_version(filename, segments=None):
+    """Version stamp for a dataset file and its segments that changes whenever either is written"""
+    segments = find_segments(filename) if segments is None else segments
+    return combine_versions([file_version(path) for path in [filename, *segments]])
+
+
+def segment_path(filename, number):
+    return f'{filename}.seg{number:04d}.ndjson'
+
+
+def find_segments(filename):
+    """Appended segment files of a dataset, in the order they were written"""
+    directory = os.path.dirname(filename) or '.'
+    prefix = os.path.basename(filename)
+    numbered = []
+    for name in os.listdir(directory):
+        match = _SEGMENT.search(name)
+        if match and name[:match.start()] == prefix:
+            numbered.append((int(match.group(1)), os.path.join(os.path.dirname(filename), name)))
+    return [path for _, path in sorted(numbered)]
+
+
+def next_segment_path(filename):
+    """Path for a new segment that sorts after all existing ones"""
+    segments = find_segments(filename)
+    number = int(_SEGMENT.search(segments[-1]).group(1)) + 1 if segments else 1
+    return segment_path(filename, number)
+
+
+def partial_path(filename):
+    """Temporary name, with the same extension, that a file is written under before replacing `filename`"""
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{os.getpid()}.partial{ext}'
+
+
+def is_ndjson(filename):
+    return filename.endswith(('.ndjson', '.jsonl'))
+
+
+def is_columnar(filename):
+    return filename.endswith('.ecol')
+
+
+def iter_records(filename, buffer_size=1 << 16):
+    """Yield experiments one at a time from an NDJSON, JSON array or columnar file"""
+    if is_columnar(filename):
+        from columnar_format import open_columnar
+        store = open_columnar(filename)
+        for row in range(len(store)):
+            yield store.record(row)
+        return
+    with open(filename, 'r', encoding='utf-8') as f:
+        if is_ndjson(filename):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f, buffer_size)
+
+
+def iter_dataset(filename):
+    """Yield the experiments of a dataset file followed by those of its appended segments"""
+    for path in [filename, *find_segments(filename)]:
+        yield from iter_records(path)
+
+
+def compact_dataset(filename, chunk_size=10000):
+    """Merge a dataset's appended segments into its main file; returns how many were merged
+
+    The merged dataset replaces the main file in one step, before the
+    segments are removed.
+    """
+    segments = find_segments(filename)
+    if not segments:
+        return 0
+    records = iter_dataset(filename)
+    with ExperimentWriter(filename) as writer:
+        for chunk in iter(lambda: list(islice(records, chunk_size)), []):
+            writer.write_chunk(chunk)
+    for path in segments:
+        os.remove(path)
+    return len(segments)
+
+
+def remove_segments(filename):
+    """Delete a dataset's appended segments, e.g. before the dataset is regenerated"""
+    for path in find_segments(filename):
+        os.remove(path)
+
+
+def _iter_json_array(f, buffer_size):
+    """Incrementally parse a top-level JSON array without loading it whole"""
+    decoder = json.JSONDecoder()
+    buf = f.read(buffer_size).lstrip()
+    if not buf.startswith('['):
+        raise ValueError('Expected a JSON array of experiments')
+    pos = 1
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            if pos >= len(buf):
+                raise json.JSONDecodeError('Truncated array', buf, pos)
+            record, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = f.read(buffer_size)
+            if not more:
+                raise
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield record
+        if pos >= buffer_size:
+            buf = buf[pos:]
+            pos = 0
+
+
+class ExperimentWriter:
+    """Write experiments chunk by chunk as NDJSON, a JSON array or a columnar file
+
+    Output goes to a temporary file that replaces `filename` on close, so
+    readers (including processes with the old file memory-mapped) never
+    see a half-written dataset; if writing fails, `filename` is untouched.
+    Columnar output is encoded into an ExperimentStore as chunks arrive and
+    written out on close, so memory grows with the compact column data
+    rather than with the records.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.count = 0
+        self._ndjson = is_ndjson(filename)
+        self._store = None
+        self._file = None
+        if is_columnar(filename):
+            from experiment_store import ExperimentStore
+            self._store = ExperimentStore()
+        else:
+            self._partial = partial_path(filename)
+            self._file = open(self._partial, 'w', encoding='utf-8')
+            if not self._ndjson:
+                self._file.write('[')
+
+    def write_chunk(self, experiments):
+        if self._store is not None:
+            for exp in experiments:
+                self._store.append(exp)
+            self.count += len(experiments)
+            return
+        self._write_objects([json.dumps(exp) for exp in experiments])
+
+    def write_batch(self, engine, batch):
+        """Write a batch drawn by a VectorizedGenerator without building a dict per experiment
+
+        Columnar output takes the batch's codes as columns; JSON output is
+        assembled from the engine's pre-rendered fragments.
+        """
+        if self._store is not None:
+            self._store.append_columns(engine.columns(batch), engine.vocabularies)
+            self.count += len(batch['experiment_id'])
+            return
+        self._write_objects(engine.encode_json(batch))
+
+    def _write_objects(self, objects):
+        """Write experiments already serialized as JSON object strings"""
+        if not objects:
+            return
+        if self._ndjson:
+            self._file.write('\n'.join(objects) + '\n')
+        else:
+            self._file.write(('\n' if self.count == 0 else ',\n') + ',\n'.join(objects))
+        self.count += len(objects)
+
+    def close(self):
+        if self._store is not None:
+            from columnar_format import write_columnar
+            write_columnar(self._store, self.filename)
+            return
+        if not self._ndjson:
+            self._file.write('\n]\n' if self.count else ']\n')
+        self._file.close()
+        os.replace(self._partial, self.filename)
+
+    def abort(self):
+        """Discard what was written, leaving any existing `filename` as it was"""
+        if self._file is not None:
+            self._file.close()
+            os.remove(self._partial)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,544 @@
+"""
+Columnar in-memory store for generated experiments
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
+import heapq
+
+# Fields stored as dictionary-encoded integer codes
+CATEGORICAL_FIELDS = [
+    'user_segment', 'region', 'climate_event', 'alert_channel',
+    'forecast_horizon', 'recommended_action', 'hypothesis', 'priority',
+    'ml_model', 'validation_method'
+]
+
+# Fields stored as packed numeric arrays (field -> array typecode)
+NUMERIC_FIELDS = {
+    'predicted_accuracy': 'd',
+    'lead_time_hours': 'i',
+    'sample_size': 'i',
+    'duration_days': 'i',
+    'cost_estimate_ngn': 'i',
+    'expected_roi': 'd'
+}
+
+# List fields, dictionary-encoded as whole tuples
+LIST_FIELDS = ['success_metrics', 'data_sources']
+
+# Categorical fields with a bitmap index built at load time
+INDEXED_FIELDS = ['user_segment', 'region', 'climate_event', 'alert_channel', 'priority', 'ml_model']
+
+# Numeric fields with precomputed sort permutations
+SORTABLE_FIELDS = ['expected_roi', 'cost_estimate_ngn', 'sample_size']
+
+# Numeric fields that accept range filters, answered from their ascending permutation
+RANGE_FIELDS = list(NUMERIC_FIELDS)
+
+# Equal-count slices of a permutation whose boundaries get a precomputed prefix bitmap
+RANGE_BUCKETS = 64
+
+# Smallest unsigned typecode able to hold a dictionary code
+_CODE_TYPES = [('B', 0xFF), ('H', 0xFFFF), ('I', 0xFFFFFFFF)]
+
+
+def _as_bitmap(bitmap):
+    """An integer bitmap, decoding a little-endian buffer if need be"""
+    return bitmap if isinstance(bitmap, int) else int.from_bytes(bitmap, 'little')
+
+
+def _code_type(size):
+    for typecode, limit in _CODE_TYPES:
+        if size <= limit:
+            return typecode
+    return 'Q'
+
+
+class ExperimentStore:
+    """Column-oriented experiment table.
+
+    Categorical and list fields hold integer codes into a per-field
+    vocabulary, numeric fields are packed arrays, and records are only
+    rebuilt as dicts for the rows that are actually returned.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = []
+        self.columns = {}
+        self.vocab = {}
+        self._codes = {}
+        self._bitmaps = {}
+        self._orders = {}
+        self._range_prefixes = {}
+        self._measures = {}
+        self._ids = None
+        self._id_order = None
+        self._bitmap_sources = {}
+        self._size = 0
+        self.version = None
+        self.sources = []
+        self._search = None
+        for field in fields or []:
+            self._add_field(field)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a store from an iterable of experiment dicts"""
+        store = cls()
+        for record in records:
+            store.append(record)
+        store.build_indexes()
+        return store
+
+    @classmethod
+    def from_columns(cls, columns, vocab, size, orders=None, bitmaps=None, id_order=None,
+                     range_prefixes=None):
+        """Wrap prebuilt columns, e.g. memory-mapped views from a columnar file
+
+        `orders` maps numeric fields to (ascending,) or (ascending, descending)
+        permutations, `bitmaps` maps indexed fields to one little-endian bitmap
+        buffer per code, `range_prefixes` maps range fields to the
+        (buffers, width) that `range_prefixes()` returns, and `id_order` is
+        the row permutation sorting experiment_id. Indexes that are not
+        supplied are built on first use.
+        """
+        store = cls()
+        store.fields = list(columns)
+        store.columns = dict(columns)
+        store._size = size
+        for field, values in vocab.items():
+            if field in LIST_FIELDS:
+                values = [tuple(v) for v in values]
+            store.vocab[field] = list(values)
+            store._codes[field] = {value: code for code, value in enumerate(store.vocab[field])}
+        store._orders = {field: (permutations[0], permutations[1] if len(permutations) > 1 else None)
+                         for field, permutations in (orders or {}).items()}
+        store._range_prefixes = dict(range_prefixes or {})
+        store._bitmap_sources = dict(bitmaps or {})
+        store._id_order = id_order
+        return store
+
+    @classmethod
+    def load(cls, filename):
+        """Open a dataset file: columnar files are memory-mapped, JSON/NDJSON is streamed in
+
+        Appended segments of the dataset are added with `extend`.
+        """
+        from columnar_format import open_columnar
+        from experiment_io import file_version, find_segments, is_columnar, iter_records
+        segments = find_segments(filename)
+        version = file_version(filename)
+        store = open_columnar(filename) if is_columnar(filename) else cls.from_records(iter_records(filename))
+        store.sources = [version]
+        store.version = version
+        store.extend_segments(segments)
+        return store
+
+    def extend_segments(self, segments):
+        """Append the experiments of segment files and record them in the store's version"""
+        from experiment_io import combine_versions, file_version, iter_records
+        for path in segments:
+            version = file_version(path)
+            self.extend(iter_records(path))
+            self.sources.append(version)
+        self.version = combine_versions(self.sources)
+
+    def refreshed(self, filename):
+        """Store for `filename` as it is on disk now
+
+        When the only change since this store was loaded is newly appended
+        segments, a copy of this store is extended with them; otherwise the
+        dataset is loaded from scratch.
+        """
+        from experiment_io import file_version, find_segments
+        segments = find_segments(filename)
+        loaded = len(self.sources) - 1
+        if self.sources and len(segments) >= loaded:
+            if self.sources == [file_version(path) for path in [filename, *segments[:loaded]]]:
+                store = self.copy()
+                store.extend_segments(segments[loaded:])
+                return store
+        return type(self).load(filename)
+
+    def copy(self):
+        """Copy that can be appended to without affecting this store"""
+        store = type(self)()
+        store.fields = list(self.fields)
+        store.columns = {field: column[:] if isinstance(column, (array, list)) else column
+                         for field, column in self.columns.items()}
+        store.vocab = {field: list(values) for field, values in self.vocab.items()}
+        store._codes = {field: dict(codes) for field, codes in self._codes.items()}
+        store._bitmaps = {field: list(postings) for field, postings in self._bitmaps.items()}
+        store._orders = dict(self._orders)
+        store._range_prefixes = dict(self._range_prefixes)
+        store._measures = dict(self._measures)
+        store._ids = dict(self._ids) if self._ids is not None else None
+        store._id_order = self._id_order
+        store._bitmap_sources = dict(self._bitmap_sources)
+        store._size = self._size
+        store.version = self.version
+        store.sources = list(self.sources)
+        store._search = self._search
+        if hasattr(self, '_mmap'):
+            store._mmap = self._mmap
+        return store
+
+    def __len__(self):
+        return self._size
+
+    def _add_field(self, field):
+        self.fields.append(field)
+        if field in CATEGORICAL_FIELDS or field in LIST_FIELDS:
+            self.columns[field] = array('B', bytes(self._size))
+            self.vocab[field] = []
+            self._codes[field] = {}
+        elif field in NUMERIC_FIELDS:
+            typecode = NUMERIC_FIELDS[field]
+            self.columns[field] = array(typecode, bytes(self._size * array(typecode).itemsize))
+        else:
+            self.columns[field] = [None] * self._size
+
+    def _encode(self, field, value):
+        if field in LIST_FIELDS:
+            value = tuple(value)
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.vocab[field])
+            self.vocab[field].append(value)
+            typecode = _code_type(code)
+            if typecode != self.columns[field].typecode:
+                self.columns[field] = array(typecode, self.columns[field])
+        return code
+
+    def _make_writable(self):
+        """Copy file-backed columns into private arrays before the first append"""
+        for field, column in self.columns.items():
+            if isinstance(column, memoryview):
+                self.columns[field] = array(column.format, column)
+            elif not isinstance(column, (array, list)):
+                self.columns[field] = list(column)
+        self._bitmap_sources.clear()
+        self._id_order = None
+
+    def append(self, record):
+        """Append one experiment dict to the store"""
+        if self._id_order is not None or self._bitmap_sources:
+            self._make_writable()
+        for field in record:
+            if field not in self.columns:
+                self._add_field(field)
+        for field in self.fields:
+            value = record.get(field)
+            if field in self._codes:
+                value = self._encode(field, value)
+            self.columns[field].append(value)
+        if self._ids is not None:
+            self._ids[record.get('experiment_id')] = self._size
+        self._size += 1
+        self._bitmaps.clear()
+        self._orders.clear()
+        self._range_prefixes.clear()
+        self._measures.clear()
+        self._search = None
+
+    def append_columns(self, columns, vocabularies=None):
+        """Append a batch of columns keyed by field, as SummaryAccumulator.update_batch takes them
+
+        Fields listed in `vocabularies` hold integer codes into those lists
+        (e.g. from VectorizedGenerator); each distinct code is encoded once
+        and the column is translated through a lookup table, so no record is
+        decoded. Other fields hold the values themselves.
+        """
+        vocabularies = vocabularies or {}
+        if self._id_order is not None or self._bitmap_sources:
+            self._make_writable()
+        size = len(next(iter(columns.values())))
+        for field in columns:
+            if field not in self.columns:
+                self._add_field(field)
+        for field in self.fields:
+            column = columns.get(field)
+            values = column.tolist() if hasattr(column, 'tolist') else column
+            if values is None:
+                values = [None] * size
+            if field in vocabularies:
+                vocab = vocabularies[field]
+                if field in self._codes:
+                    lookup = [None] * len(vocab)
+                    for code in set(values):
+                        lookup[code] = self._encode(field, vocab[code])
+                else:
+                    lookup = vocab
+                values = map(lookup.__getitem__, values)
+            elif field in self._codes:
+                values = [self._encode(field, value) for value in values]
+            self.columns[field].extend(values)
+        if self._ids is not None:
+            ids = self.columns['experiment_id']
+            self._ids.update(zip(ids[self._size:], range(self._size, self._size + size)))
+        self._size += size
+        self._bitmaps.clear()
+        self._orders.clear()
+        self._range_prefixes.clear()
+        self._measures.clear()
+        self._search = None
+
+    def extend(self, records):
+        """Append experiment dicts, updating the indexes already built instead of dropping them
+
+        New rows get their bits ORed into the existing bitmaps, and only the
+        new rows are sorted before being merged into each sort permutation.
+        """
+        postings = {field: self.bitmaps(field) for field in {*self._bitmaps, *self._bitmap_sources}}
+        orders = dict(self._orders)
+        search = self._search
+        start = self._size
+        for record in records:
+            self.append(record)
+        if self._size == start:
+            self._bitmaps.update(postings)
+            self._orders.update(orders)
+            self._search = search
+            return
+        if search is not None:
+            self._search = search.extended(self, start)
+        for field, old in postings.items():
+            new = self._bitmap_tail(field, start)
+            old = list(old) + [0] * (len(new) - len(old))
+            self._bitmaps[field] = [bits | tail << start for bits, tail in zip(old, new)]
+        typecode = _code_type(self._size)
+        for field, permutations in orders.items():
+            key = self.columns[field].__getitem__
+            added = range(start, self._size)
+            self._orders[field] = tuple(
+                None if permutation is None else
+                array(typecode, heapq.merge(permutation, sorted(added, key=key, reverse=reverse),
+                                            key=key, reverse=reverse))
+                for reverse, permutation in zip((False, True), permutations)
+            )
+
+    def code(self, field, value):
+        """Return the dictionary code for a value, or None if it never occurs"""
+        if field in LIST_FIELDS:
+            value = tuple(value)
+        return self._codes[field].get(value)
+
+    def value(self, field, row):
+        """Decode a single cell"""
+        cell = self.columns[field][row]
+        if field in LIST_FIELDS:
+            return list(self.vocab[field][cell])
+        if field in self._codes:
+            return self.vocab[field][cell]
+        return cell
+
+    def record(self, row, fields=None):
+        """Materialize one row as a dict"""
+        return {field: self.value(field, row) for field in (fields or self.fields)}
+
+    def records(self, rows, fields=None):
+        """Materialize the given rows as a list of dicts"""
+        return [self.record(row, fields) for row in rows]
+
+    def distinct(self, field):
+        """Distinct values of a categorical field"""
+        return list(self.vocab[field])
+
+    def build_indexes(self, fields=None, sort_fields=None):
+        """Build the experiment ID index, bitmap indexes and sort permutations"""
+        if self._ids is None and self._id_order is None and 'experiment_id' in self.columns:
+            self._ids = {exp_id: row for row, exp_id in enumerate(self.columns['experiment_id'])}
+        for field in INDEXED_FIELDS if fields is None else fields:
+            if field in self._codes:
+                self.bitmaps(field)
+        for field in SORTABLE_FIELDS if sort_fields is None else sort_fields:
+            if field in self.columns:
+                self.order(field)
+                self.order(field, reverse=True)
+
+    def build_range_indexes(self, fields=None):
+        """Build the ascending permutations and prefix bitmaps that range filters use
+
+        Otherwise each field's are built on its first range filter;
+        columnar files carry them prebuilt.
+        """
+        for field in RANGE_FIELDS if fields is None else fields:
+            if field in self.columns:
+                self.range_prefixes(field)
+
+    def bitmaps(self, field):
+        """Posting lists of a categorical field as integer bitmaps, one per code"""
+        if field not in self._bitmaps and field in self._bitmap_sources:
+            self._bitmaps[field] = [int.from_bytes(buf, 'little') for buf in self._bitmap_sources[field]]
+        if field not in self._bitmaps:
+            self._bitmaps[field] = self._bitmap_tail(field, 0)
+        return self._bitmaps[field]
+
+    def _bitmap_tail(self, field, start):
+        """Bitmaps per code over rows `start` onwards, with bit 0 standing for row `start`"""
+        nbytes = (self._size - start + 7) // 8
+        buffers = [bytearray(nbytes) for _ in self.vocab[field]]
+        for row, code in enumerate(self.columns[field][start:]):
+            buffers[code][row >> 3] |= 1 << (row & 7)
+        return [int.from_bytes(buf, 'little') for buf in buffers]
+
+    def match(self, ranges=None, **filters):
+        """Bitmap of rows matching all filters
+
+        A filter value is either one value or a list of accepted values.
+        Numeric fields match through their range index. `ranges` maps
+        numeric fields to inclusive (low, high) bounds, where None leaves
+        that side open. Raises ValueError for fields that can't be filtered.
+        """
+        result = (1 << self._size) - 1
+        for field, value in filters.items():
+            if not value:
+                continue
+            items = value if isinstance(value, list) else [value]
+            accepted = 0
+            if field in self._codes:
+                postings = self.bitmaps(field)
+                for item in items:
+                    code = self.code(field, item)
+                    if code is not None:
+                        accepted |= postings[code]
+            elif field in NUMERIC_FIELDS:
+                for item in items:
+                    accepted |= self.range_bitmap(field, item, item)
+            elif field in self.columns:
+                raise ValueError(f"Can't filter on {field}")
+            result &= accepted
+        for field, (low, high) in (ranges or {}).items():
+            result &= self.range_bitmap(field, low, high)
+        return result
+
+    def _rows_bitmap(self, rows):
+        buf = bytearray((self._size + 7) // 8)
+        for row in rows:
+            buf[row >> 3] |= 1 << (row & 7)
+        return int.from_bytes(buf, 'little')
+
+    def range_bitmap(self, field, low=None, high=None):
+        """Bitmap of rows with low <= value <= high, found by binary search
+
+        The bounds are located in the field's ascending permutation. The
+        buckets of it lying wholly inside the range are the difference of
+        two precomputed prefix bitmaps, so only rows in the two partial
+        buckets at the ends are visited.
+        """
+        if field not in self.columns:
+            return 0
+        order = self.order(field)
+        key = self.columns[field].__getitem__
+        start = 0 if low is None else bisect_left(order, low, key=key)
+        stop = self._size if high is None else bisect_right(order, high, key=key)
+        if start >= stop:
+            return 0
+        prefixes, width = self.range_prefixes(field)
+        first, last = -(-start // width), stop // width
+        if first >= last:
+            return self._rows_bitmap(order[start:stop])
+        result = self._rows_bitmap(chain(order[start:first * width], order[last * width:stop]))
+        # The prefix up to bucket `first` is contained in the one up to bucket `last`
+        return result | _as_bitmap(prefixes[last]) ^ _as_bitmap(prefixes[first])
+
+    def range_prefixes(self, field):
+        """(prefixes, width): prefixes[i] is the bitmap of the first i * width rows of the ascending permutation
+
+        Prefixes from a columnar file stay as memory-mapped buffers and are
+        decoded two at a time, per range filter.
+        """
+        if field not in self._range_prefixes:
+            width = max(1, -(-self._size // RANGE_BUCKETS))
+            order = self.order(field)
+            prefixes = [0]
+            for i in range(0, self._size, width):
+                prefixes.append(prefixes[-1] | self._rows_bitmap(order[i:i + width]))
+            self._range_prefixes[field] = (prefixes, width)
+        return self._range_prefixes[field]
+
+    def iter_rows(self, bitmap):
+        """Yield the row numbers set in a bitmap, in ascending order"""
+        bits = bin(bitmap)[:1:-1]
+        row = bits.find('1')
+        while row != -1:
+            yield row
+            row = bits.find('1', row + 1)
+
+    def filter_rows(self, **filters):
+        """Return row numbers matching all equality filters"""
+        return list(self.iter_rows(self.match(**filters)))
+
+    def counts(self, field, bitmap=None):
+        """Per-value counts of a categorical field, optionally within a bitmap"""
+        postings = self.bitmaps(field)
+        if bitmap is None:
+            counts = [posting.bit_count() for posting in postings]
+        else:
+            counts = [(posting & bitmap).bit_count() for posting in postings]
+        return {value: count for value, count in zip(self.vocab[field], counts) if count}
+
+    def order(self, field, reverse=False):
+        """Row permutation ordering a numeric column, ties kept in row order
+
+        Each direction is built on first use, so fields that are only
+        range-filtered never get a descending permutation.
+        """
+        permutations = self._orders.get(field, (None, None))
+        if permutations[reverse] is None:
+            key = self.columns[field].__getitem__
+            built = array(_code_type(self._size), sorted(range(self._size), key=key, reverse=reverse))
+            permutations = (permutations[0], built) if reverse else (built, permutations[1])
+            self._orders[field] = permutations
+        return permutations[reverse]
+
+    def sorted_rows(self, bitmap, field, reverse=False, limit=None):
+        """Rows of a bitmap ordered by a numeric column
+
+        Walks the precomputed permutation and keeps rows set in the bitmap,
+        stopping after `limit` rows. When the bitmap is so sparse that the
+        walk would visit more entries than it has rows, the matching rows are
+        ranked directly with a bounded heap instead.
+        """
+        count = bitmap.bit_count()
+        wanted = count if limit is None else min(limit, count)
+        permutation = self.order(field, reverse)
+        if count == self._size:
+            return islice(permutation, wanted)
+        if wanted * self._size > count * count:
+            key = self.columns[field].__getitem__
+            rows = self.iter_rows(bitmap)
+            if reverse:
+                return heapq.nlargest(wanted, rows, key=key)
+            return heapq.nsmallest(wanted, rows, key=key)
+        mask = bitmap.to_bytes((self._size + 7) // 8, 'little')
+        matches = (row for row in permutation if mask[row >> 3] >> (row & 7) & 1)
+        return islice(matches, wanted)
+
+    def search_index(self):
+        """Inverted index over the text fields, built on first use"""
+        if self._search is None:
+            from search_index import SearchIndex
+            self._search = SearchIndex(self)
+        return self._search
+
+    def measure_index(self, field, scale=1):
+        """Bit-sliced index of a numeric field for bitmap sums and percentiles, built on first use"""
+        if field not in self._measures:
+            from facet_index import BitSlicedIndex
+            self._measures[field] = BitSlicedIndex(self.columns[field], scale)
+        return self._measures[field]
+
+    def find(self, experiment_id):
+        """Row number of an experiment ID, or None"""
+        if self._id_order is not None:
+            ids = self.columns['experiment_id']
+            i = bisect_left(self._id_order, experiment_id, key=ids.__getitem__)
+            if i < self._size and ids[self._id_order[i]] == experiment_id:
+                return self._id_order[i]
+            return None
+        if self._ids is None:
+            self.build_indexes([])
+        return self._ids.get(experiment_id) if self._ids is not None else None
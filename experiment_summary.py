@@ -0,0 +1,114 @@
+"""
+Single-pass, mergeable summary statistics for experiment datasets
+"""
+
+from collections import Counter
+
+# Summary histogram key -> experiment field
+CATEGORY_FIELDS = {
+    'by_segment': 'user_segment',
+    'by_region': 'region',
+    'by_event': 'climate_event',
+    'by_channel': 'alert_channel'
+}
+
+# Summed numeric fields -> summary key reporting their mean (or total)
+SUM_FIELDS = ['sample_size', 'cost_estimate_ngn', 'expected_roi']
+
+
+class SummaryAccumulator:
+    """Running counts, sums and per-category histograms.
+
+    Accumulators can be fed one record at a time, a column batch at a time,
+    or merged with each other, so shards and appended batches can be
+    summarised independently and combined without revisiting any rows.
+    `to_dict()` produces the experiment_summary.json layout.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sums = {field: 0 for field in SUM_FIELDS}
+        self.histograms = {key: Counter() for key in CATEGORY_FIELDS}
+        self.high_priority_count = 0
+
+    @classmethod
+    def from_dict(cls, summary):
+        """Rebuild an accumulator from a saved summary"""
+        acc = cls()
+        acc.count = summary['total_experiments']
+        acc.sums['sample_size'] = summary['avg_sample_size'] * acc.count
+        acc.sums['cost_estimate_ngn'] = summary['total_estimated_cost']
+        acc.sums['expected_roi'] = summary['avg_expected_roi'] * acc.count
+        acc.high_priority_count = summary['high_priority_count']
+        for key in CATEGORY_FIELDS:
+            acc.histograms[key].update(summary.get(key, {}))
+        return acc
+
+    def update(self, record):
+        """Add one experiment dict"""
+        self.count += 1
+        for field in SUM_FIELDS:
+            self.sums[field] += record[field]
+        if record['priority'] == 'high':
+            self.high_priority_count += 1
+        for key, field in CATEGORY_FIELDS.items():
+            self.histograms[key][record[field]] += 1
+        return self
+
+    def update_many(self, records):
+        for record in records:
+            self.update(record)
+        return self
+
+    def update_batch(self, columns, vocabularies=None):
+        """Add a batch of columns (lists, arrays or NumPy arrays) keyed by field
+
+        Fields listed in `vocabularies` hold integer codes into those lists,
+        as produced by VectorizedGenerator and ExperimentStore; other
+        categorical fields hold the values themselves.
+        """
+        vocabularies = vocabularies or {}
+        size = len(columns['priority'])
+        self.count += size
+        for field in SUM_FIELDS:
+            column = columns[field]
+            self.sums[field] += column.sum().item() if hasattr(column, 'sum') else sum(column)
+
+        def histogram(field):
+            column = columns[field]
+            counts = Counter(column.tolist() if hasattr(column, 'tolist') else column)
+            if field in vocabularies:
+                vocab = vocabularies[field]
+                return Counter({vocab[code]: n for code, n in counts.items()})
+            return counts
+
+        self.high_priority_count += histogram('priority').get('high', 0)
+        for key, field in CATEGORY_FIELDS.items():
+            self.histograms[key].update(histogram(field))
+        return self
+
+    def merge(self, other):
+        """Fold another accumulator into this one"""
+        self.count += other.count
+        for field in SUM_FIELDS:
+            self.sums[field] += other.sums[field]
+        self.high_priority_count += other.high_priority_count
+        for key in CATEGORY_FIELDS:
+            self.histograms[key].update(other.histograms[key])
+        return self
+
+    def mean(self, field):
+        return self.sums[field] / self.count if self.count else 0
+
+    def to_dict(self):
+        return {
+            'total_experiments': self.count,
+            'by_segment': dict(self.histograms['by_segment']),
+            'by_region': dict(self.histograms['by_region']),
+            'by_event': dict(self.histograms['by_event']),
+            'by_channel': dict(self.histograms['by_channel']),
+            'avg_sample_size': self.mean('sample_size'),
+            'total_estimated_cost': self.sums['cost_estimate_ngn'],
+            'avg_expected_roi': self.mean('expected_roi'),
+            'high_priority_count': self.high_priority_count
+        }
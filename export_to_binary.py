@@ -0,0 +1,24 @@
+"""
+Convert the experiments dataset to the memory-mappable columnar format
+"""
+
+from columnar_format import open_columnar, write_columnar
+from experiment_io import find_dataset
+from experiment_store import ExperimentStore
+
+def export_to_binary(output='climate_experiments.ecol'):
+    # Load experiments
+    source = find_dataset(['climate_experiments.ndjson', 'climate_experiments.json'])
+    if source is None:
+        print("No climate_experiments.json or .ndjson found - run climate_experiment_generator.py first")
+        return
+    store = ExperimentStore.load(source)
+    
+    # Write columns, sort permutations and bitmap indexes
+    write_columnar(store, output)
+    
+    print(f"✓ Exported {len(open_columnar(output))} experiments from {source} to {output}")
+    print("  The web app memory-maps this file on startup")
+
+if __name__ == "__main__":
+    export_to_binary()
@@ -1,40 +1,129 @@
 """
-Export experiments to CSV for spreadsheet analysis
+Export experiments to CSV for spreadsheet analysis, or to Parquet / Arrow IPC for columnar tools
 """
 
-import json
+import argparse
 import csv
+from itertools import islice
+
+from experiment_io import find_dataset, iter_dataset
+
+# CSV / table columns, in output order
+FIELDNAMES = [
+    'experiment_id', 'user_segment', 'region', 'climate_event',
+    'alert_channel', 'forecast_horizon', 'predicted_accuracy',
+    'lead_time_hours', 'recommended_action', 'sample_size',
+    'duration_days', 'cost_estimate_ngn', 'expected_roi',
+    'priority', 'ml_model', 'validation_method', 'hypothesis',
+    'success_metrics', 'data_sources'
+]
+
+LIST_FIELDS = ['success_metrics', 'data_sources']
+
+def iter_batches(source, batch_size):
+    """Read experiments (including appended segments) incrementally and group them into lists of batch_size"""
+    records = iter_dataset(source)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def export_to_csv(source=None, output='climate_experiments.csv', batch_size=10000):
+    # Stream experiments from whichever dataset file is newest
+    source = source or find_dataset()
+    if source is None:
+        print("No dataset found - run climate_experiment_generator.py first")
+        return
+    count = 0
 
-def export_to_csv():
-    # Load experiments
-    with open('climate_experiments.json', 'r') as f:
-        experiments = json.load(f)
-    
-    # Define CSV columns
-    fieldnames = [
-        'experiment_id', 'user_segment', 'region', 'climate_event',
-        'alert_channel', 'forecast_horizon', 'predicted_accuracy',
-        'lead_time_hours', 'recommended_action', 'sample_size',
-        'duration_days', 'cost_estimate_ngn', 'expected_roi',
-        'priority', 'ml_model', 'validation_method', 'hypothesis'
-    ]
-    
     # Write to CSV
-    with open('climate_experiments.csv', 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
         writer.writeheader()
-        
-        for exp in experiments:
-            row = {k: exp.get(k, '') for k in fieldnames}
-            # Convert lists to strings
-            if isinstance(row.get('success_metrics'), list):
-                row['success_metrics'] = ', '.join(exp.get('success_metrics', []))
-            if isinstance(row.get('data_sources'), list):
-                row['data_sources'] = ', '.join(exp.get('data_sources', []))
-            writer.writerow(row)
-    
-    print(f"✓ Exported {len(experiments)} experiments to climate_experiments.csv")
+
+        for batch in iter_batches(source, batch_size):
+            for exp in batch:
+                # Convert lists to strings
+                for field in LIST_FIELDS:
+                    if isinstance(exp.get(field), list):
+                        exp[field] = ', '.join(exp[field])
+            writer.writerows(batch)
+            count += len(batch)
+
+    print(f"✓ Exported {count} experiments to {output}")
     print("  Open in Excel, Google Sheets, or any spreadsheet software")
 
+def arrow_schema(dictionary=True):
+    """Arrow schema for experiments: dictionary-encoded categoricals, list columns kept as lists
+
+    Arrow IPC files allow only one dictionary per column for the whole
+    file, so batches written there use plain (compressed) strings instead.
+    """
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string()) if dictionary else pa.string()
+    types = {
+        'experiment_id': pa.string(),
+        'predicted_accuracy': pa.float64(),
+        'lead_time_hours': pa.int32(),
+        'sample_size': pa.int32(),
+        'duration_days': pa.int32(),
+        'cost_estimate_ngn': pa.int64(),
+        'expected_roi': pa.float64(),
+        'success_metrics': pa.list_(pa.string()),
+        'data_sources': pa.list_(pa.string())
+    }
+    return pa.schema([(field, types.get(field, category)) for field in FIELDNAMES])
+
+def export_to_columnar(source=None, output='climate_experiments.parquet', fmt='parquet',
+                       row_group_size=100000):
+    """Stream experiments into a Parquet file or an Arrow IPC file, one row group per batch"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow is required for Parquet/Arrow export: pip install pyarrow")
+        return
+
+    source = source or find_dataset()
+    if source is None:
+        print("No dataset found - run climate_experiment_generator.py first")
+        return
+    schema = arrow_schema(dictionary=fmt == 'parquet')
+    count = 0
+
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(output, schema, compression='zstd')
+    else:
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        writer = pa.ipc.new_file(output, schema, options=options)
+
+    with writer:
+        for batch in iter_batches(source, row_group_size):
+            table = pa.Table.from_pylist(batch, schema=schema)
+            if fmt == 'parquet':
+                writer.write_table(table, row_group_size=row_group_size)
+            else:
+                writer.write_table(table, max_chunksize=row_group_size)
+            count += len(batch)
+
+    print(f"✓ Exported {count} experiments to {output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export experiments to CSV, Parquet or Arrow IPC")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], default='csv')
+    parser.add_argument('--source', help="dataset to read (defaults to the newest climate_experiments file)")
+    parser.add_argument('--output', help="output file (defaults to climate_experiments.<format>)")
+    parser.add_argument('--batch-size', type=int, default=10000, help="rows per CSV write batch")
+    parser.add_argument('--row-group-size', type=int, default=100000,
+                        help="rows per Parquet row group / Arrow record batch")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    export_to_csv()
+    args = parse_args()
+    output = args.output or f'climate_experiments.{args.format}'
+    if args.format == 'csv':
+        export_to_csv(args.source, output, args.batch_size)
+    else:
+        export_to_columnar(args.source, output, args.format, args.row_group_size)
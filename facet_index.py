@@ -0,0 +1,110 @@
+"""
+Bitmap aggregations for faceted drill-down: counts, sums and percentiles without visiting rows
+"""
+
+from functools import partial
+
+# Categorical dimensions counted per facet
+FACET_FIELDS = ['user_segment', 'region', 'climate_event', 'alert_channel', 'priority', 'ml_model']
+
+# Numeric measures summarised per facet -> scale that makes their values integers
+MEASURES = {'expected_roi': 100, 'cost_estimate_ngn': 1}
+
+PERCENTILES = [25, 50, 75, 90]
+
+# Selections up to this many rows are aggregated directly from their rows
+EXACT_ROWS = 2048
+
+
+class BitSlicedIndex:
+    """A numeric column kept as one bitmap per binary digit of its values
+
+    Values are multiplied by `scale` and rounded (ROI is stored in cents),
+    then offset so the smallest is zero. The sum over any row bitmap is
+    one popcount per digit, and the k-th smallest value is found by
+    narrowing the bitmap one digit at a time, from the top.
+    """
+
+    def __init__(self, column, scale=1):
+        self.scale = scale
+        values = [round(value * scale) for value in column]
+        self.offset = min(values, default=0)
+        width = (max(values, default=0) - self.offset).bit_length() or 1
+        # All values as fixed-width binary strings, so each digit is one stepped slice
+        digits = ''.join(format(value - self.offset, f'0{width}b') for value in values)
+        self.slices = [int(digits[width - 1 - bit::width][::-1] or '0', 2) for bit in range(width)]
+        # Complements kept alongside, so narrowing to the zeros of a digit is a plain AND
+        full = (1 << len(values)) - 1
+        self.zeros = [full ^ digit for digit in self.slices]
+
+    def _unscale(self, value):
+        return value / self.scale if self.scale != 1 else value
+
+    def sum(self, bitmap):
+        total = sum((bitmap & digit).bit_count() << bit for bit, digit in enumerate(self.slices))
+        return self._unscale(total + self.offset * bitmap.bit_count())
+
+    def kth(self, bitmap, k):
+        """k-th smallest value (from 0) among the rows set in bitmap"""
+        value = 0
+        for bit in reversed(range(len(self.slices))):
+            zeros = bitmap & self.zeros[bit]
+            count = zeros.bit_count()
+            if k < count:
+                bitmap = zeros
+            else:
+                k -= count
+                bitmap &= self.slices[bit]
+                value |= 1 << bit
+        return self._unscale(value + self.offset)
+
+    def extreme(self, bitmap, largest=False):
+        """Smallest (or largest) value among the rows set in a non-empty bitmap, without popcounts"""
+        prefer = self.slices if largest else self.zeros
+        value = 0
+        for bit in reversed(range(len(self.slices))):
+            narrowed = bitmap & prefer[bit]
+            # If no row has the preferred digit, every row has the other one
+            if narrowed:
+                bitmap = narrowed
+            if bool(narrowed) == largest:
+                value |= 1 << bit
+        return self._unscale(value + self.offset)
+
+
+def _rank(percentile, count):
+    """Nearest-rank position (from 0) of a percentile among `count` sorted values"""
+    return percentile * (count - 1) // 100
+
+
+def measure_summary(store, field, bitmap, count):
+    """Sum, mean, min, max and percentiles of a numeric field over a row bitmap"""
+    if count == 0:
+        return {'sum': 0, 'mean': None, 'min': None, 'max': None,
+                **{f'p{p}': None for p in PERCENTILES}}
+    if count <= EXACT_ROWS:
+        column = store.columns[field]
+        values = sorted(column[row] for row in store.iter_rows(bitmap))
+        total = sum(values)
+        pick = values.__getitem__
+        low, high = values[0], values[-1]
+    else:
+        index = store.measure_index(field, MEASURES[field])
+        total = index.sum(bitmap)
+        pick = partial(index.kth, bitmap)
+        low, high = index.extreme(bitmap), index.extreme(bitmap, largest=True)
+    summary = {'sum': round(total, 2), 'mean': round(total / count, 2), 'min': low, 'max': high}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = pick(_rank(p, count))
+    return summary
+
+
+def facets(store, bitmap):
+    """Per-dimension counts and measure summaries for the rows in bitmap"""
+    count = bitmap.bit_count()
+    return {
+        'total': count,
+        'counts': {field: store.counts(field, bitmap) for field in FACET_FIELDS if field in store.vocab},
+        'measures': {field: measure_summary(store, field, bitmap, count)
+                     for field in MEASURES if field in store.columns}
+    }
@@ -0,0 +1,218 @@
+"""
+Compare forecasting models on a yearly climate series with rolling-origin cross-validation
+"""
+
+import argparse
+import hashlib
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# A polynomial trend in the year, least-squares fitted, optionally ridge-penalised
+# and/or fitted on only the last `window` years of the training data
+ModelSpec = namedtuple('ModelSpec', ['name', 'degree', 'alpha', 'window'])
+
+MODEL_GRID = [
+    ModelSpec('Mean baseline', 0, 0.0, None),
+    ModelSpec('Linear Regression', 1, 0.0, None),
+    ModelSpec('Recent linear trend (30 years)', 1, 0.0, 30),
+    ModelSpec('Polynomial (degree 2)', 2, 0.0, None),
+    ModelSpec('Polynomial (degree 3)', 3, 0.0, None),
+    ModelSpec('Polynomial (degree 4)', 4, 0.0, None),
+    ModelSpec('Polynomial (degree 5)', 5, 0.0, None),
+    ModelSpec('Ridge polynomial (degree 3)', 3, 1.0, None),
+    ModelSpec('Ridge polynomial (degree 5)', 5, 1.0, None),
+]
+
+DEFAULT_SPLITS = 5
+
+# Ranked tables already computed in this process, keyed by data and settings;
+# least recently used ones are dropped beyond MAX_CACHED_RESULTS
+MAX_CACHED_RESULTS = 32
+_RESULTS = OrderedDict()
+
+
+def rolling_splits(size, n_splits=DEFAULT_SPLITS, test_size=None):
+    """(train_end, test_end) per split: train on rows [0, train_end), test on [train_end, test_end)
+
+    Like scikit-learn's TimeSeriesSplit, the test windows are consecutive
+    and end at the last row, and each split trains on everything before
+    its window.
+    """
+    test_size = test_size or size // (n_splits + 1)
+    first = size - n_splits * test_size
+    if test_size < 1 or first < 2:
+        raise ValueError(f"{size} rows are too few for {n_splits} splits of {test_size}")
+    return [(first + i * test_size, first + (i + 1) * test_size) for i in range(n_splits)]
+
+
+def _fit(design, values, degree, alpha):
+    """Coefficients of the first degree + 1 design columns; the intercept is not penalised"""
+    X = design[:, :degree + 1]
+    if alpha:
+        penalty = np.sqrt(alpha) * np.eye(degree + 1)[1:]
+        X = np.vstack([X, penalty])
+        values = np.concatenate([values, np.zeros(degree)])
+    return np.linalg.lstsq(X, values, rcond=None)[0]
+
+
+def _design(years, center, scale, degree):
+    """Powers 0..degree of the standardized years; standardizing keeps high degrees well conditioned"""
+    return np.vander((years - center) / scale, degree + 1, increasing=True)
+
+
+def _evaluate_split(task):
+    """Out-of-sample predictions of every model in the grid for one split"""
+    years, values, train_end, test_end, grid = task
+    train_years = years[:train_end]
+    center, scale = train_years.mean(), train_years.std() or 1.0
+    # One design matrix per split, at the highest degree; each model uses its leading columns
+    design = _design(years[:test_end], center, scale, max(spec.degree for spec in grid))
+    predictions = []
+    for spec in grid:
+        start = max(0, train_end - spec.window) if spec.window else 0
+        coef = _fit(design[start:train_end], values[start:train_end], spec.degree, spec.alpha)
+        predictions.append(design[train_end:test_end, :spec.degree + 1] @ coef)
+    return predictions
+
+
+def _cache_key(years, values, grid, n_splits, test_size):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(years.tobytes())
+    digest.update(values.tobytes())
+    return digest.hexdigest(), tuple(grid), n_splits, test_size
+
+
+def compare_models(years, values, grid=None, n_splits=DEFAULT_SPLITS, test_size=None, workers=None):
+    """Rank the models in `grid` by cross-validated forecast error, best first
+
+    Every model is fitted on each split's training years and scored on
+    the years that follow. Passing `workers` evaluates the splits in
+    parallel on that many processes. Returns one dict per model with
+    its rank, error across all test years (RMSE, MAE, out-of-sample R²)
+    and its worst split's RMSE. Results are cached per series and settings,
+    keeping the MAX_CACHED_RESULTS most recently used.
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.asarray(values, dtype=float)
+    grid = list(grid or MODEL_GRID)
+    key = _cache_key(years, values, grid, n_splits, test_size)
+    if key in _RESULTS:
+        _RESULTS.move_to_end(key)
+        return [dict(row) for row in _RESULTS[key]]
+
+    splits = rolling_splits(len(years), n_splits, test_size)
+    tasks = [(years, values, train_end, test_end, grid) for train_end, test_end in splits]
+    workers = min(workers or 1, len(tasks))
+    if workers == 1:
+        results = [_evaluate_split(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluate_split, tasks))
+
+    actual = np.concatenate([values[train_end:test_end] for train_end, test_end in splits])
+    total = ((actual - actual.mean()) ** 2).sum()
+    rows = []
+    for i, spec in enumerate(grid):
+        errors = [split[i] - values[train_end:test_end] for split, (train_end, test_end) in zip(results, splits)]
+        flat = np.concatenate(errors)
+        rows.append({
+            'model': spec.name,
+            'degree': spec.degree,
+            'rmse': float(np.sqrt((flat ** 2).mean())),
+            'mae': float(np.abs(flat).mean()),
+            'r2': float(1 - (flat ** 2).sum() / total) if total else None,
+            'worst_split_rmse': float(max(np.sqrt((e ** 2).mean()) for e in errors)),
+        })
+    rows.sort(key=lambda row: row['rmse'])
+    for rank, row in enumerate(rows, 1):
+        row['rank'] = rank
+    _RESULTS[key] = rows
+    if len(_RESULTS) > MAX_CACHED_RESULTS:
+        _RESULTS.popitem(last=False)
+    return [dict(row) for row in rows]
+
+
+def holdout_score(years, values, spec, horizon):
+    """Error of `spec` forecasting the last `horizon` years when fitted on the years before them
+
+    Returns the RMSE and out-of-sample R² over the held-out years; R² is
+    None when they have no variance (e.g. a single year).
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.asarray(values, dtype=float)
+    train_end = len(years) - horizon
+    if horizon < 1 or train_end < spec.degree + 1:
+        raise ValueError(f"{len(years)} rows are too few to hold out {horizon} years")
+    train_years = years[:train_end]
+    center, scale = train_years.mean(), train_years.std() or 1.0
+    design = _design(years, center, scale, spec.degree)
+    start = max(0, train_end - spec.window) if spec.window else 0
+    coef = _fit(design[start:train_end], values[start:train_end], spec.degree, spec.alpha)
+    actual = values[train_end:]
+    errors = design[train_end:] @ coef - actual
+    total = ((actual - actual.mean()) ** 2).sum()
+    return {
+        'rmse': float(np.sqrt((errors ** 2).mean())),
+        'r2': float(1 - (errors ** 2).sum() / total) if total else None,
+    }
+
+
+def load_series(path, x='Year', y=None):
+    """Years and values from a CSV with a header row, or an .npz dataset snapshot
+
+    `y` defaults to the first column other than `x`.
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            columns = {name: data[name] for name in data.files}
+    else:
+        table = np.genfromtxt(path, delimiter=',', names=True)
+        columns = {name: table[name] for name in table.dtype.names}
+    y = y or next(name for name in columns if name != x)
+    years, values = columns[x].astype(float), columns[y].astype(float)
+    keep = ~(np.isnan(years) | np.isnan(values))
+    return years[keep], values[keep]
+
+
+def print_table(rows):
+    print(f"{'Rank':<5} {'Model':<32} {'RMSE':>8} {'MAE':>8} {'R²':>8} {'Worst RMSE':>11}")
+    print("-" * 76)
+    for row in rows:
+        r2 = f"{row['r2']:.3f}" if row['r2'] is not None else '-'
+        print(f"{row['rank']:<5} {row['model']:<32} {row['rmse']:>8.4f} {row['mae']:>8.4f} "
+              f"{r2:>8} {row['worst_split_rmse']:>11.4f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rank forecasting models by cross-validated error")
+    parser.add_argument('path', nargs='?',
+                        default=os.path.join(os.environ.get('DATASET_CACHE_DIR', '.dataset_cache'),
+                                             'global_temp.npz'),
+                        help="CSV with a header row, or an .npz snapshot (default: cached global temperature)")
+    parser.add_argument('--x', default='Year', help="column holding the year")
+    parser.add_argument('--y', help="column to forecast (default: the first other column)")
+    parser.add_argument('--splits', type=int, default=DEFAULT_SPLITS, help="number of rolling splits")
+    parser.add_argument('--test-size', type=int, help="years per test window (default: rows / (splits + 1))")
+    parser.add_argument('--workers', type=int, help="evaluate splits in parallel on this many processes")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.path):
+        print(f"No dataset at {args.path} - pass a CSV, or open the playground once to cache one")
+        return
+    years, values = load_series(args.path, args.x, args.y)
+    splits = rolling_splits(len(years), args.splits, args.test_size)
+    print(f"✓ Loaded {len(years)} years from {args.path}")
+    print(f"Scoring {len(MODEL_GRID)} models on {len(splits)} rolling splits "
+          f"({splits[0][1] - splits[0][0]} test years each)\n")
+    print_table(compare_models(years, values, n_splits=args.splits, test_size=args.test_size,
+                               workers=args.workers))
+
+
+if __name__ == "__main__":
+    main()
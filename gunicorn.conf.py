@@ -0,0 +1,58 @@
+"""
+Gunicorn settings for serving app.py in production
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app's code is imported once in the master (preload_app), and when a
+dataset file already exists the master loads it and builds its indexes
+before forking, so every worker shares that one copy copy-on-write (a
+columnar .ecol dataset is also memory-mapped, sharing its pages through
+the OS page cache). If the dataset has to be generated first, workers
+start answering straight away and load it in a background thread (see
+live_dataset.py): one worker generates it while the others wait on a
+file lock, and each then loads its own copy. A hot reload also happens
+per worker, so after one each worker holds a private copy until restarted.
+
+Environment:
+    PORT               port to bind (default 5000)
+    WEB_CONCURRENCY    worker processes (default: 2 x CPU cores + 1)
+    GUNICORN_THREADS   threads per worker (default 4)
+    GUNICORN_TIMEOUT   worker timeout in seconds (default 30)
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+# Import the app once, before forking
+preload_app = True
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def when_ready(server):
+    # Load an existing dataset here, before forking, so the workers share it
+    from app import DATASET
+    from experiment_io import find_dataset
+    if find_dataset() is not None and DATASET.load_now():
+        server.log.info(f"Loaded {len(DATASET.store)} experiments before forking")
+    
+    # Move everything loaded so far out of the collector's generations, so
+    # collections in the workers don't touch (and copy) the shared pages
+    gc.freeze()
+    server.log.info(f"Serving with {workers} workers x {threads} threads")
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork: each worker starts its own watcher, and its
+    # own loader if the master had nothing to load
+    from app import DATASET
+    DATASET.start()
@@ -0,0 +1,71 @@
+"""
+Fast JSON encoding and response compression for the Flask API
+"""
+
+import gzip
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Content-Encodings we can produce, most preferred first
+ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+
+def dumps(obj):
+    """Serialize to compact, key-sorted UTF-8 JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def negotiate_encoding(request, size):
+    """Best Content-Encoding the client accepts for a body of `size` bytes, or None"""
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that routes jsonify through `dumps`"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def compress_response(response, request):
+    """after_request hook: compress large JSON bodies the view did not already encode"""
+    if (response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json' or response.status_code != 200):
+        return response
+    body = response.get_data()
+    encoding = negotiate_encoding(request, len(body))
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,134 @@
+"""
+SQLite store of forecast submissions and the per-contributor leaderboard built from them
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    contributor TEXT NOT NULL,
+    model TEXT NOT NULL,
+    years_ahead INTEGER NOT NULL,
+    dataset_version TEXT NOT NULL,
+    rmse REAL NOT NULL,
+    r2 REAL,
+    submitted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_by_score ON submissions (rmse);
+CREATE INDEX IF NOT EXISTS submissions_by_date ON submissions (submitted_at);
+CREATE INDEX IF NOT EXISTS submissions_by_contributor ON submissions (contributor, rmse);
+
+-- One row per contributor on each board (dataset version and forecast horizon),
+-- kept up to date by every submission
+CREATE TABLE IF NOT EXISTS leaderboard (
+    dataset_version TEXT NOT NULL,
+    years_ahead INTEGER NOT NULL,
+    contributor TEXT NOT NULL,
+    best_rmse REAL NOT NULL,
+    best_submission INTEGER NOT NULL REFERENCES submissions (id),
+    submissions INTEGER NOT NULL,
+    last_submitted REAL NOT NULL,
+    PRIMARY KEY (dataset_version, years_ahead, contributor)
+);
+CREATE INDEX IF NOT EXISTS leaderboard_by_score
+    ON leaderboard (dataset_version, years_ahead, best_rmse, best_submission);
+"""
+
+# Folds a new submission into its contributor's row on its board; SET expressions see the old values
+_UPSERT = """
+INSERT INTO leaderboard (dataset_version, years_ahead, contributor, best_rmse, best_submission,
+                         submissions, last_submitted)
+VALUES (?, ?, ?, ?, ?, 1, ?)
+ON CONFLICT (dataset_version, years_ahead, contributor) DO UPDATE SET
+    best_submission = CASE WHEN excluded.best_rmse < best_rmse
+                           THEN excluded.best_submission ELSE best_submission END,
+    best_rmse = min(best_rmse, excluded.best_rmse),
+    submissions = submissions + 1,
+    last_submitted = excluded.last_submitted
+"""
+
+_TOP = """
+SELECT l.contributor, l.best_rmse, l.submissions, l.last_submitted, s.model, s.r2, s.years_ahead
+FROM leaderboard l JOIN submissions s ON s.id = l.best_submission
+WHERE l.dataset_version = ? AND l.years_ahead = ?
+ORDER BY l.best_rmse, l.best_submission
+LIMIT ?
+"""
+
+
+class LeaderboardStore:
+    """Forecast submissions scored by RMSE on held-out years, lower is better
+
+    Scores are only comparable on the same data and horizon, so each
+    (dataset version, years ahead) pair has its own board. The database
+    runs in WAL mode, so page views keep reading while a submission is
+    written. Each submission updates its contributor's row on its board in
+    the same transaction, and `top` reads the first k rows off the score
+    index instead of ranking every submission.
+    Connections are per thread, as sqlite3 requires.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as db:
+            columns = [row['name'] for row in db.execute('PRAGMA table_info(leaderboard)')]
+            rebuild = bool(columns) and 'dataset_version' not in columns
+            if rebuild:
+                # Boards used to span every dataset and horizon; they are derived, so rebuild them
+                db.execute('DROP TABLE leaderboard')
+            db.executescript(SCHEMA)
+            if rebuild:
+                for row in db.execute('SELECT * FROM submissions ORDER BY id').fetchall():
+                    db.execute(_UPSERT, (row['dataset_version'], row['years_ahead'], row['contributor'],
+                                         row['rmse'], row['id'], row['submitted_at']))
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def submit(self, contributor, model, years_ahead, dataset_version, rmse, r2=None):
+        """Record a forecast run; returns its submission id"""
+        contributor = contributor.strip()
+        if not contributor:
+            raise ValueError("contributor name is required")
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                'INSERT INTO submissions (contributor, model, years_ahead, dataset_version, rmse, r2, submitted_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (contributor, model, years_ahead, dataset_version, rmse, r2, now))
+            db.execute(_UPSERT, (dataset_version, years_ahead, contributor, rmse, cursor.lastrowid, now))
+        return cursor.lastrowid
+
+    def version(self):
+        """Id of the newest submission; changes whenever the leaderboard may have"""
+        return self._connect().execute('SELECT max(id) FROM submissions').fetchone()[0] or 0
+
+    def top(self, dataset_version, years_ahead, k=10):
+        """Best submission per contributor for the k best contributors on one board, best first"""
+        return [dict(row) for row in self._connect().execute(_TOP, (dataset_version, years_ahead, k))]
+
+    def recent(self, limit=10):
+        """Newest submissions first"""
+        return [dict(row) for row in self._connect().execute(
+            'SELECT * FROM submissions ORDER BY submitted_at DESC LIMIT ?', (limit,))]
+
+    def stats(self):
+        db = self._connect()
+        submissions = db.execute('SELECT count(*) FROM submissions').fetchone()[0]
+        contributors = db.execute('SELECT count(DISTINCT contributor) FROM leaderboard').fetchone()[0]
+        return {'submissions': submissions, 'contributors': contributors}
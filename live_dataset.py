@@ -0,0 +1,153 @@
+"""
+Experiment dataset loaded in the background so the web server can start at once,
+and swapped for a fresh snapshot whenever the dataset file is rewritten
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+# One loaded dataset; replaced as a whole so readers never mix two versions
+Snapshot = namedtuple('Snapshot', ['store', 'summary'])
+
+
+class LiveDataset:
+    """Holds the current experiment snapshot once `load` has produced one
+
+    `load` is called in a daemon thread with the current snapshot (None
+    on the first load) and returns `(store, summary)`.
+    Until the first load finishes, `ready` is unset and `snapshot` is None;
+    if it fails, `error` holds the message and `start()` may try again.
+
+    `reload()` loads again in the background and swaps the new snapshot in
+    with a single assignment, so requests holding the old one finish
+    against it. With `watch_interval`, a watcher thread polls
+    `current_version()` and reloads when it differs from the loaded store.
+    """
+
+    def __init__(self, load, current_version=None, watch_interval=0, on_swap=None):
+        self.load = load
+        self.current_version = current_version
+        self.watch_interval = watch_interval
+        self.on_swap = on_swap
+        self.snapshot = None
+        self.error = None
+        self.started_at = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.ready = threading.Event()
+        self._thread = None
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        return self.snapshot.store if self.snapshot else None
+
+    @property
+    def summary(self):
+        return self.snapshot.summary if self.snapshot else None
+
+    @property
+    def loading(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Begin loading in the background, unless loaded or already loading"""
+        self._start_watcher()
+        if not self.ready.is_set():
+            self._start_load()
+
+    def load_now(self):
+        """Load in the calling thread; returns whether the dataset is ready
+
+        Meant for a pre-fork server master: forked workers inherit the
+        loaded snapshot and share its memory copy-on-write.
+        """
+        self.started_at = time.monotonic()
+        self._run()
+        return self.ready.is_set()
+
+    def reload(self):
+        """Load the dataset again in the background; returns False if a load is already running"""
+        return self._start_load()
+
+    def _start_load(self):
+        with self._lock:
+            if self.loading:
+                return False
+            self.started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name='dataset-loader', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        try:
+            store, summary = self.load(self.snapshot)
+        except Exception as exc:
+            log.exception("Loading the experiment dataset failed")
+            self.error = f'{type(exc).__name__}: {exc}'
+            return
+        swapped = self.snapshot is not None
+        self.snapshot = Snapshot(store, summary)
+        self.error = None
+        self.loaded_at = time.monotonic()
+        self.ready.set()
+        if swapped:
+            self.reloads += 1
+            if self.on_swap:
+                self.on_swap(self.snapshot)
+        log.info("Loaded %d experiments (%s) in %.2fs", len(store), store.version,
+                 self.loaded_at - self.started_at)
+
+    def _start_watcher(self):
+        if not self.watch_interval or self.current_version is None:
+            return
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._watcher = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        """Reload once the dataset's version has changed and held still for one interval"""
+        seen = None
+        failed = None
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                version = self.current_version()
+            except OSError:
+                continue
+            loaded = self.store.version if self.snapshot else None
+            # A version that failed to load is not retried until the file changes again
+            if version is None or version == loaded or version == failed or self.loading:
+                seen = None
+                continue
+            if version != seen:
+                # Still being written, or just finished: wait for it to settle
+                seen = version
+                continue
+            if self._start_load():
+                self._thread.join()
+            failed = version if self.error else None
+            seen = None
+
+    def wait(self, timeout=None):
+        """Block until the dataset is loaded; returns whether it is"""
+        return self.ready.wait(timeout)
+
+    def status(self):
+        """Readiness report for health checks"""
+        if self.ready.is_set():
+            status = {'status': 'ready', 'experiments': len(self.store), 'version': self.store.version,
+                      'reloads': self.reloads, 'reloading': self.loading}
+            if self.error:
+                status['reload_error'] = self.error
+            return status
+        if self.error:
+            return {'status': 'error', 'error': self.error}
+        return {'status': 'loading' if self.started_at is not None else 'starting'}
@@ -0,0 +1,143 @@
+"""
+LRU cache of serialized API responses with strong ETags
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import Response, request
+
+from json_encoding import compress, negotiate_encoding
+
+# `encoded` holds compressed variants of `body`, filled in on first request for each encoding;
+# `key` is None for responses too large to cache
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'headers', 'size', 'encoded', 'key'])
+
+# Rough per-entry bookkeeping cost counted against the byte budget
+_ENTRY_OVERHEAD = 512
+
+
+class ResponseCache:
+    """Serialized responses keyed by (dataset version, endpoint, normalized query).
+
+    Entries are evicted least-recently-used first once their combined size,
+    compressed variants included, passes `max_bytes`. Keys carry the dataset version, so a new dataset
+    never sees stale entries; `clear()` drops the old ones eagerly.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, headers=None):
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        size = len(body) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return CachedResponse(body, etag, dict(headers or {}), size, {}, None)
+        entry = CachedResponse(body, etag, dict(headers or {}), size, {}, key)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= _cost(old)
+            self._entries[key] = entry
+            self.size += entry.size
+            self._evict()
+        return entry
+
+    def variant(self, entry, encoding):
+        """The entry's body compressed with `encoding`, compressed once and counted against `max_bytes`"""
+        body = entry.encoded.get(encoding)
+        if body is not None:
+            return body
+        body = compress(entry.body, encoding)
+        with self._lock:
+            if encoding in entry.encoded:
+                return entry.encoded[encoding]
+            # Only keep variants of entries that are still cached
+            if entry.key is not None and self._entries.get(entry.key) is entry:
+                entry.encoded[encoding] = body
+                self.size += len(body)
+                self._evict()
+        return body
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= _cost(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _cost(entry):
+    return entry.size + sum(len(body) for body in entry.encoded.values())
+
+
+def send_cached(cache, entry):
+    """Build a conditional response for an entry of `cache` in the client's preferred encoding
+
+    Compressed variants are produced once per entry and reused; each one
+    gets its own strong ETag.
+    """
+    encoding = negotiate_encoding(request, len(entry.body))
+    body, etag = entry.body, entry.etag
+    if encoding:
+        body = cache.variant(entry, encoding)
+        etag = f'{entry.etag}-{encoding}'
+
+    response = Response(body, mimetype='application/json', headers=entry.headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def normalized_query():
+    """Request arguments with empty values dropped, in a canonical order"""
+    return tuple(sorted((k, v) for k, v in request.args.items(multi=True) if v))
+
+
+def cached_json(cache, version, cached_headers=()):
+    """Serve a JSON view from `cache`, compressed as negotiated, answering If-None-Match with 304
+
+    `version` is called per request and returns the current dataset
+    version. Only 200 responses are cached, together with any of
+    `cached_headers` they set.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (version(), request.path, normalized_query())
+            entry = cache.get(key)
+            if entry is None:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+                headers = {h: response.headers[h] for h in cached_headers if h in response.headers}
+                entry = cache.put(key, response.get_data(), headers)
+            return send_cached(cache, entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,165 @@
+"""
+Inverted index for full-text search over experiment text fields
+"""
+
+import math
+import re
+
+# Dictionary-encoded fields whose values are searchable
+TEXT_FIELDS = ['hypothesis', 'success_metrics', 'recommended_action', 'data_sources']
+
+# Most query tokens used for ranking; further tokens still filter
+MAX_RANKED_TOKENS = 8
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase words; underscores and punctuation separate them"""
+    return _TOKEN.findall(text.lower())
+
+
+def parse_query(query):
+    """Parse a query into AND-ed groups of OR-ed terms, each term a list of tokens
+
+    Words are AND-ed; `OR` between two words makes them alternatives, so
+    `flood OR drought sms` means (flood OR drought) AND sms. A word that
+    splits into several tokens, like `apply_fertilizer`, needs all of them.
+    """
+    groups = []
+    pending_or = False
+    for word in query.split():
+        if word == 'OR':
+            pending_or = bool(groups)
+            continue
+        if word == 'AND':
+            continue
+        tokens = tokenize(word)
+        if not tokens:
+            continue
+        if pending_or:
+            groups[-1].append(tokens)
+        else:
+            groups.append([tokens])
+        pending_or = False
+    return groups
+
+
+def _signature_groups(tokens, masks):
+    """Split tokens into groups whose combinations occur in at most 256 distinct ways
+
+    `masks` holds, per dictionary code, a bitmask of the tokens its value
+    contains. Within a group, every code can then be mapped to a one-byte
+    class, and each token's rows are found with a single bytes.translate.
+    """
+    groups, current, group_mask = [], [], 0
+    for bit, token in enumerate(tokens):
+        trial = group_mask | 1 << bit
+        if current and len({mask & trial for mask in masks}) > 256:
+            groups.append((current, group_mask))
+            current, trial = [], 1 << bit
+        current.append((token, 1 << bit))
+        group_mask = trial
+    if current:
+        groups.append((current, group_mask))
+    return groups
+
+
+def token_bitmaps(column, values, start=0):
+    """Row bitmaps per token for a dictionary-encoded column, from row `start` onwards
+
+    `values` are the column's vocabulary (strings or tuples of strings).
+    Bit 0 of every bitmap stands for row `start`.
+    """
+    column = column[start:]
+    if not len(column):
+        return {}
+    code_tokens = [set(tokenize(' '.join(v) if isinstance(v, tuple) else str(v))) for v in values]
+    tokens = sorted(set().union(*code_tokens))
+    bits = {token: 1 << i for i, token in enumerate(tokens)}
+    masks = [sum(bits[token] for token in code) for code in code_tokens]
+
+    bitmaps = {}
+    raw = bytes(column) if column.itemsize == 1 else None
+    for group, group_mask in _signature_groups(tokens, masks):
+        classes = {}
+        class_of = bytes(classes.setdefault(mask & group_mask, len(classes)) for mask in masks)
+        if raw is not None:
+            class_column = raw.translate(class_of.ljust(256, b'\0'))
+        else:
+            class_column = bytes(map(class_of.__getitem__, column))
+        for token, bit in group:
+            # '1'/'0' per row, reversed so that int(..., 2) puts row 0 in bit 0
+            table = bytes(49 if signature & bit else 48 for signature in classes).ljust(256, b'0')
+            bitmaps[token] = int(class_column.translate(table)[::-1], 2)
+    return bitmaps
+
+
+class SearchIndex:
+    """Token -> row bitmap postings over a store's text fields
+
+    Tokens come from each distinct value in the field vocabularies, so the
+    text is tokenized once per value rather than once per row.
+    """
+
+    def __init__(self, store, fields=None, postings=None):
+        self.fields = [f for f in (fields or TEXT_FIELDS) if f in store.vocab]
+        self.size = len(store)
+        self.postings = postings if postings is not None else {}
+        if postings is None:
+            self._add(store, 0)
+
+    def _add(self, store, start):
+        for field in self.fields:
+            for token, bitmap in token_bitmaps(store.columns[field], store.vocab[field], start).items():
+                self.postings[token] = self.postings.get(token, 0) | bitmap << start
+
+    def extended(self, store, start):
+        """Index for `store` after rows from `start` on were appended, reusing these postings"""
+        index = SearchIndex(store, self.fields, dict(self.postings))
+        index._add(store, start)
+        return index
+
+    def posting(self, token):
+        return self.postings.get(token, 0)
+
+    def idf(self, token):
+        return math.log(1 + self.size / (1 + self.posting(token).bit_count()))
+
+    def match(self, groups):
+        """Bitmap of rows matching parsed query groups"""
+        result = (1 << self.size) - 1
+        for group in groups:
+            alternatives = 0
+            for tokens in group:
+                term = (1 << self.size) - 1
+                for token in tokens:
+                    term &= self.posting(token)
+                alternatives |= term
+            result &= alternatives
+        return result
+
+    def ranked(self, bitmap, groups):
+        """Split a bitmap into (score, rows bitmap) groups, best score first
+
+        A row scores the summed idf of the query tokens it contains, so rows
+        matching more, and rarer, alternatives come first; rows with equal
+        scores stay in dataset order.
+        """
+        tokens = list(dict.fromkeys(token for group in groups for tokens in group for token in tokens))
+        parts = [(0.0, bitmap)] if bitmap else []
+        for token in tokens[:MAX_RANKED_TOKENS]:
+            posting, weight = self.posting(token), self.idf(token)
+            split = []
+            for score, rows in parts:
+                hit = rows & posting
+                if hit:
+                    split.append((score + weight, hit))
+                if hit != rows:
+                    split.append((score, rows & ~posting))
+            parts = split
+        # Different token subsets can sum to the same score; their rows rank together
+        merged = {}
+        for score, rows in parts:
+            merged[score] = merged.get(score, 0) | rows
+        return sorted(merged.items(), key=lambda part: -part[0])
@@ -1,6 +1,10 @@
 // Global state
-let allExperiments = [];
-let filteredExperiments = [];
+const PAGE_SIZE = 50;
+const LIST_FIELDS = ['experiment_id', 'user_segment', 'region', 'expected_roi', 'priority'];
+let loadedExperiments = [];
+let totalExperiments = 0;
+let nextCursor = null;
+const experimentDetails = new Map();
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
@@ -10,16 +14,27 @@ document.addEventListener('DOMContentLoaded', () => {
     setupEventListeners();
 });
 
-// Load summary statistics
+// Fetch from the API, waiting out 503s while the server is still loading its data
+async function apiFetch(url, options) {
+    for (;;) {
+        const response = await fetch(url, options);
+        if (response.status !== 503) return response;
+        const delay = parseInt(response.headers.get('Retry-After'), 10) || 2;
+        await new Promise(resolve => setTimeout(resolve, delay * 1000));
+    }
+}
+
+// Load summary statistics for the experiments matching the current filters
 async function loadSummary() {
     try {
-        const response = await fetch('/api/summary');
-        const summary = await response.json();
+        const response = await apiFetch(`/api/facets?${filterQuery()}`);
+        const facets = await response.json();
+        const avgRoi = facets.measures.expected_roi.mean;
         
-        document.getElementById('total-experiments').textContent = summary.total_experiments;
-        document.getElementById('avg-roi').textContent = summary.avg_expected_roi.toFixed(2) + 'x';
-        document.getElementById('total-cost').textContent = '₦' + (summary.total_estimated_cost / 1000000).toFixed(1) + 'M';
-        document.getElementById('high-priority').textContent = summary.high_priority_count;
+        document.getElementById('total-experiments').textContent = facets.total;
+        document.getElementById('avg-roi').textContent = avgRoi === null ? '-' : avgRoi.toFixed(2) + 'x';
+        document.getElementById('total-cost').textContent = '₦' + (facets.measures.cost_estimate_ngn.sum / 1000000).toFixed(1) + 'M';
+        document.getElementById('high-priority').textContent = facets.counts.priority.high || 0;
     } catch (error) {
         console.error('Error loading summary:', error);
     }
@@ -28,7 +43,7 @@ async function loadSummary() {
 // Load filter options
 async function loadFilters() {
     try {
-        const response = await fetch('/api/filters');
+        const response = await apiFetch('/api/filters');
         const filters = await response.json();
         
         populateSelect('segment-filter', filters.segments, 'Segment');
@@ -54,42 +69,99 @@ function populateSelect(id, options, label, formatUnderscore = false) {
     });
 }
 
-// Load experiments
-async function loadExperiments() {
-    const params = new URLSearchParams({
+// Build the query for the current filters
+function filterQuery() {
+    return new URLSearchParams({
         segment: document.getElementById('segment-filter').value,
         region: document.getElementById('region-filter').value,
         event: document.getElementById('event-filter').value,
         channel: document.getElementById('channel-filter').value,
-        priority: document.getElementById('priority-filter').value,
-        sort: document.getElementById('sort-filter').value,
-        order: 'desc'
+        priority: document.getElementById('priority-filter').value
     });
-    
+}
+
+// Build the query for the current filters, sort order and page
+function experimentQuery() {
+    const sort = document.getElementById('sort-filter').value;
+    const fields = LIST_FIELDS.includes(sort) ? LIST_FIELDS : LIST_FIELDS.concat(sort);
+    const params = filterQuery();
+    params.set('sort', sort);
+    params.set('order', 'desc');
+    params.set('limit', PAGE_SIZE);
+    params.set('fields', fields.join(','));
+    return params;
+}
+
+// Load the first page of experiments
+async function loadExperiments() {
+    loadedExperiments = [];
+    nextCursor = null;
+    await fetchExperimentPage(experimentQuery());
+}
+
+// Append the next page of experiments
+async function loadMoreExperiments() {
+    if (!nextCursor) return;
+    const params = experimentQuery();
+    params.set('cursor', nextCursor);
+    await fetchExperimentPage(params);
+}
+
+async function fetchExperimentPage(params) {
     try {
-        const response = await fetch(`/api/experiments?${params}`);
+        const response = await apiFetch(`/api/experiments?${params}`);
         const experiments = await response.json();
         
-        allExperiments = experiments;
-        filteredExperiments = experiments;
-        displayExperiments(experiments);
+        totalExperiments = parseInt(response.headers.get('X-Total-Count'), 10) || experiments.length;
+        nextCursor = response.headers.get('X-Next-Cursor');
+        loadedExperiments = loadedExperiments.concat(experiments);
+        displayExperiments(loadedExperiments);
+        prefetchExperimentDetails(experiments.map(exp => exp.experiment_id));
     } catch (error) {
         console.error('Error loading experiments:', error);
     }
 }
 
+// Fetch full records for a page of experiments in one request
+async function prefetchExperimentDetails(ids) {
+    const missing = ids.filter(id => !experimentDetails.has(id));
+    if (missing.length === 0) return;
+    
+    try {
+        const response = await apiFetch('/api/experiments/batch', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ids: missing})
+        });
+        const batch = await response.json();
+        batch.experiments.forEach(exp => experimentDetails.set(exp.experiment_id, exp));
+    } catch (error) {
+        console.error('Error prefetching experiment details:', error);
+    }
+}
+
+// Label and formatting for the active sort column on each card
+const SORT_STATS = {
+    cost_estimate_ngn: ['Cost', exp => `₦${(exp.cost_estimate_ngn / 1000).toFixed(0)}k`],
+    sample_size: ['Sample', exp => exp.sample_size.toLocaleString()]
+};
+
 // Display experiments
 function displayExperiments(experiments) {
     const container = document.getElementById('experiments-list');
     const countElement = document.getElementById('results-count');
+    const loadMore = document.getElementById('load-more');
     
-    countElement.textContent = `Showing ${experiments.length} experiments`;
+    countElement.textContent = `Showing ${experiments.length} of ${totalExperiments} experiments`;
+    loadMore.style.display = nextCursor ? 'block' : 'none';
     
     if (experiments.length === 0) {
         container.innerHTML = '<p style="text-align: center; color: #999; padding: 40px;">No experiments found matching your filters.</p>';
         return;
     }
     
+    const sortStat = SORT_STATS[document.getElementById('sort-filter').value];
+    
     container.innerHTML = experiments.map(exp => `
         <div class="experiment-card" onclick="showExperimentDetails('${exp.experiment_id}')">
             <div class="experiment-header">
@@ -106,18 +178,6 @@ function displayExperiments(experiments) {
                     <span class="meta-label">Region:</span>
                     <span class="meta-value">${exp.region}</span>
                 </div>
-                <div class="meta-item">
-                    <span class="meta-label">Event:</span>
-                    <span class="meta-value">${exp.climate_event.replace(/_/g, ' ')}</span>
-                </div>
-                <div class="meta-item">
-                    <span class="meta-label">Channel:</span>
-                    <span class="meta-value">${exp.alert_channel.replace(/_/g, ' ')}</span>
-                </div>
-            </div>
-            
-            <div class="experiment-hypothesis">
-                "${exp.hypothesis}"
             </div>
             
             <div class="experiment-stats">
@@ -125,18 +185,11 @@ function displayExperiments(experiments) {
                     <span class="stat-item-label">ROI</span>
                     <span class="stat-item-value">${exp.expected_roi}x</span>
                 </div>
+                ${sortStat ? `
                 <div class="stat-item">
-                    <span class="stat-item-label">Cost</span>
-                    <span class="stat-item-value">₦${(exp.cost_estimate_ngn / 1000).toFixed(0)}k</span>
-                </div>
-                <div class="stat-item">
-                    <span class="stat-item-label">Sample</span>
-                    <span class="stat-item-value">${exp.sample_size.toLocaleString()}</span>
-                </div>
-                <div class="stat-item">
-                    <span class="stat-item-label">Duration</span>
-                    <span class="stat-item-value">${exp.duration_days}d</span>
-                </div>
+                    <span class="stat-item-label">${sortStat[0]}</span>
+                    <span class="stat-item-value">${sortStat[1](exp)}</span>
+                </div>` : ''}
             </div>
         </div>
     `).join('');
@@ -145,8 +198,12 @@ function displayExperiments(experiments) {
 // Show experiment details in modal
 async function showExperimentDetails(expId) {
     try {
-        const response = await fetch(`/api/experiment/${expId}`);
-        const exp = await response.json();
+        let exp = experimentDetails.get(expId);
+        if (!exp) {
+            const response = await apiFetch(`/api/experiment/${expId}`);
+            exp = await response.json();
+            experimentDetails.set(expId, exp);
+        }
         
         const modalBody = document.getElementById('modal-body');
         modalBody.innerHTML = `
@@ -259,9 +316,15 @@ async function showExperimentDetails(expId) {
 function setupEventListeners() {
     // Filter changes
     document.querySelectorAll('.filter-select').forEach(select => {
-        select.addEventListener('change', loadExperiments);
+        select.addEventListener('change', () => {
+            if (select.id !== 'sort-filter') loadSummary();
+            loadExperiments();
+        });
     });
     
+    // Paging
+    document.getElementById('load-more').addEventListener('click', loadMoreExperiments);
+    
     // Reset filters
     document.getElementById('reset-filters').addEventListener('click', () => {
         document.querySelectorAll('.filter-select').forEach(select => {
@@ -269,6 +332,7 @@ function setupEventListeners() {
                 select.value = '';
             }
         });
+        loadSummary();
         loadExperiments();
     });
     
@@ -13,9 +13,14 @@ from sklearn.preprocessing import PolynomialFeatures
 from sklearn.pipeline import make_pipeline
 import requests
 from io import StringIO
+import hashlib
 import json
 import os
 
+from dataset_cache import DatasetCache
+from forecast_engine import DEFAULT_SPLITS, MODEL_GRID, compare_models, holdout_score
+from leaderboard_store import LeaderboardStore
+
 # Page config
 st.set_page_config(
     page_title="Climate × ML Playground",
@@ -137,36 +142,59 @@ with tab1:
         ["Global Temperature (1880-2024)", "Arctic Sea Ice Extent", "CO2 Levels (Mauna Loa)"]
     )
     
-    @st.cache_data
-    def load_global_temp():
+    @st.cache_resource
+    def dataset_cache():
+        """Snapshot cache shared by every session of this server"""
+        return DatasetCache(os.environ.get('DATASET_CACHE_DIR', '.dataset_cache'),
+                            ttl=float(os.environ.get('DATASET_CACHE_TTL') or 24 * 3600))
+    
+    def fetch_global_temp():
         url = "https://data.giss.nasa.gov/gistemp/tabledata_v4/GLB.Ts+dSST.csv"
-        try:
-            response = requests.get(url, timeout=10)
-            df = pd.read_csv(StringIO(response.text), skiprows=1)
-            df = df[['Year', 'J-D']].copy()
-            df.columns = ['Year', 'Temperature_Anomaly']
-            df = df[df['Year'] != 'Year'].dropna()
-            df['Year'] = pd.to_numeric(df['Year'], errors='coerce')
-            df['Temperature_Anomaly'] = pd.to_numeric(df['Temperature_Anomaly'], errors='coerce')
-            return df.dropna()
-        except:
-            # Fallback synthetic data
-            years = np.arange(1880, 2025)
-            temps = np.linspace(-0.4, 1.2, len(years)) + np.random.normal(0, 0.1, len(years))
-            return pd.DataFrame({'Year': years, 'Temperature_Anomaly': temps})
-    
-    @st.cache_data
-    def load_arctic_ice():
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        df = pd.read_csv(StringIO(response.text), skiprows=1)
+        df = df[['Year', 'J-D']].copy()
+        df.columns = ['Year', 'Temperature_Anomaly']
+        df = df[df['Year'] != 'Year'].dropna()
+        df['Year'] = pd.to_numeric(df['Year'], errors='coerce')
+        df['Temperature_Anomaly'] = pd.to_numeric(df['Temperature_Anomaly'], errors='coerce')
+        return df.dropna().reset_index(drop=True)
+    
+    # Synthetic series are seeded, so every refresh and every server draws the same data
+    SYNTHETIC_SEED = 42
+    
+    def synthetic_global_temp():
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        years = np.arange(1880, 2025)
+        temps = np.linspace(-0.4, 1.2, len(years)) + rng.normal(0, 0.1, len(years))
+        return pd.DataFrame({'Year': years, 'Temperature_Anomaly': temps})
+    
+    def synthetic_arctic_ice():
+        rng = np.random.default_rng(SYNTHETIC_SEED)
         years = np.arange(1979, 2025)
-        ice = 7.5 - (years - 1979) * 0.08 + np.random.normal(0, 0.3, len(years))
+        ice = 7.5 - (years - 1979) * 0.08 + rng.normal(0, 0.3, len(years))
         return pd.DataFrame({'Year': years, 'Ice_Extent_Million_km2': ice})
     
-    @st.cache_data
-    def load_co2():
+    def synthetic_co2():
+        rng = np.random.default_rng(SYNTHETIC_SEED)
         years = np.arange(1958, 2025)
-        co2 = 315 + (years - 1958) * 2.2 + np.random.normal(0, 2, len(years))
+        co2 = 315 + (years - 1958) * 2.2 + rng.normal(0, 2, len(years))
         return pd.DataFrame({'Year': years, 'CO2_ppm': co2})
     
+    # Loaders read the on-disk snapshot (never the network); a refreshed snapshot shows up within the ttl
+    @st.cache_data(ttl=300)
+    def load_global_temp():
+        # Until NASA GISS has been reached once, synthetic data stands in
+        return dataset_cache().get('global_temp', fetch_global_temp, fallback=synthetic_global_temp)
+    
+    @st.cache_data(ttl=300)
+    def load_arctic_ice():
+        return dataset_cache().get('arctic_ice', synthetic_arctic_ice)
+    
+    @st.cache_data(ttl=300)
+    def load_co2():
+        return dataset_cache().get('co2', synthetic_co2)
+    
     if dataset_choice == "Global Temperature (1880-2024)":
         df = load_global_temp()
         y_col = 'Temperature_Anomaly'
@@ -233,67 +261,85 @@ with tab2:
     
     col1, col2 = st.columns([3, 1])
     
+    # Model type -> polynomial degree of its features
+    FORECAST_MODELS = {"Linear Regression": 1, "Polynomial (degree 3)": 3}
+    
+    def dataset_version(df):
+        """Content hash of a dataset, so cached models are refit only when the data changes"""
+        hashed = pd.util.hash_pandas_object(df, index=False).values
+        return hashlib.blake2b(hashed.tobytes(), digest_size=8).hexdigest()
+    
+    @st.cache_resource(max_entries=16)
+    def fit_forecast_model(version, model_type, degree, _df):
+        """Fitted model and its training R², shared by every session until evicted"""
+        X = _df['Year'].values.reshape(-1, 1)
+        y = _df['Temperature_Anomaly'].values
+        if degree == 1:
+            model = LinearRegression()
+        else:
+            model = make_pipeline(PolynomialFeatures(degree), LinearRegression())
+        model.fit(X, y)
+        return model, model.score(X, y)
+    
+    @st.cache_data(max_entries=256)
+    def forecast(version, model_type, degree, years_ahead, _df):
+        """Predictions, R² and chart for one horizon of a cached model"""
+        model, train_score = fit_forecast_model(version, model_type, degree, _df)
+        last_year = _df['Year'].max()
+        future_years = np.arange(last_year + 1, last_year + years_ahead + 1)
+        predictions = model.predict(future_years.reshape(-1, 1))
+        
+        fig = go.Figure()
+        
+        # Historical data
+        fig.add_trace(go.Scatter(
+            x=_df['Year'],
+            y=_df['Temperature_Anomaly'],
+            mode='lines+markers',
+            name='Historical Data',
+            line=dict(color='#4ecdc4', width=2),
+            marker=dict(size=4)
+        ))
+        
+        # Predictions
+        fig.add_trace(go.Scatter(
+            x=future_years,
+            y=predictions,
+            mode='lines+markers',
+            name='Forecast',
+            line=dict(color='#ff6b6b', width=3, dash='dash'),
+            marker=dict(size=8, symbol='star')
+        ))
+        
+        fig.update_layout(
+            title=f"Temperature Forecast using {model_type}",
+            xaxis_title="Year",
+            yaxis_title="Temperature Anomaly (°C)",
+            template="plotly_dark",
+            height=500,
+            hovermode='x unified'
+        )
+        return predictions, train_score, fig
+    
     with col1:
         years_ahead = st.slider("📅 Forecast Years Ahead", 1, 30, 10)
-        model_choice = st.selectbox("🤖 Model Type", ["Linear Regression", "Polynomial (degree 3)"])
+        model_choice = st.selectbox("🤖 Model Type", list(FORECAST_MODELS))
     
     with col2:
         st.markdown("### 🎯 Quick Actions")
         if st.button("🔄 Retrain Model", use_container_width=True):
+            # Re-read the snapshot and fetch a fresh one in the background;
+            # the model is refit only once the data has changed
+            dataset_cache().refresh('global_temp', fetch_global_temp)
+            load_global_temp.clear()
             st.rerun()
     
-    # Load data and train model
+    # Load data; the model for this data version is fitted once and then reused
     df_temp = load_global_temp()
-    X = df_temp['Year'].values.reshape(-1, 1)
     y = df_temp['Temperature_Anomaly'].values
-    
-    # Train model
-    if model_choice == "Linear Regression":
-        model = LinearRegression()
-        model.fit(X, y)
-    else:
-        model = make_pipeline(PolynomialFeatures(3), LinearRegression())
-        model.fit(X, y)
-    
-    # Make predictions
-    future_years = np.arange(df_temp['Year'].max() + 1, df_temp['Year'].max() + years_ahead + 1)
-    future_X = future_years.reshape(-1, 1)
-    predictions = model.predict(future_X)
-    
-    # Calculate metrics
-    train_score = model.score(X, y)
-    
-    # Plot
-    fig = go.Figure()
-    
-    # Historical data
-    fig.add_trace(go.Scatter(
-        x=df_temp['Year'],
-        y=df_temp['Temperature_Anomaly'],
-        mode='lines+markers',
-        name='Historical Data',
-        line=dict(color='#4ecdc4', width=2),
-        marker=dict(size=4)
-    ))
-    
-    # Predictions
-    fig.add_trace(go.Scatter(
-        x=future_years,
-        y=predictions,
-        mode='lines+markers',
-        name='Forecast',
-        line=dict(color='#ff6b6b', width=3, dash='dash'),
-        marker=dict(size=8, symbol='star')
-    ))
-    
-    fig.update_layout(
-        title=f"Temperature Forecast using {model_choice}",
-        xaxis_title="Year",
-        yaxis_title="Temperature Anomaly (°C)",
-        template="plotly_dark",
-        height=500,
-        hovermode='x unified'
-    )
+    version = dataset_version(df_temp)
+    predictions, train_score, fig = forecast(
+        version, model_choice, FORECAST_MODELS[model_choice], years_ahead, df_temp)
     
     st.plotly_chart(fig, use_container_width=True)
     
@@ -306,6 +352,44 @@ with tab2:
     with col3:
         st.metric("Predicted Change", f"+{predictions[-1] - y[-1]:.2f}°C")
     
+    # Every model in the engine's grid, scored on years it was not trained on
+    @st.cache_data(max_entries=16)
+    def model_comparison(version, _df):
+        rows = compare_models(_df['Year'].values, _df['Temperature_Anomaly'].values)
+        return pd.DataFrame(rows)[['rank', 'model', 'rmse', 'mae', 'r2', 'worst_split_rmse']]
+    
+    st.markdown("### 🧮 Model Comparison")
+    st.caption(f"Each model is trained on the years before a test window and scored on it, "
+               f"over {DEFAULT_SPLITS} rolling windows. Lower RMSE is better.")
+    comparison = model_comparison(version, df_temp)
+    st.dataframe(comparison, use_container_width=True, hide_index=True)
+    
+    @st.cache_resource
+    def leaderboard_store():
+        """Submission database shared by every session of this server"""
+        return LeaderboardStore(os.environ.get('LEADERBOARD_DB', 'leaderboard.db'))
+    
+    @st.cache_data(max_entries=256)
+    def submission_score(version, model_type, years_ahead, _df):
+        """The chosen model's error forecasting the last `years_ahead` years from the years before them"""
+        spec = next(spec for spec in MODEL_GRID if spec.name == model_type)
+        return holdout_score(_df['Year'].values, _df['Temperature_Anomaly'].values, spec, years_ahead)
+    
+    # Runs are scored on the horizon the contributor picked, not the shared cross-validation
+    score = submission_score(version, model_choice, years_ahead, df_temp)
+    st.caption(f"Submissions are scored by hiding the last {years_ahead} years, fitting {model_choice} "
+               f"on the years before them and measuring the forecast error on the hidden years. "
+               f"Each horizon has its own leaderboard, since longer horizons are harder to forecast.")
+    with st.form("submit_forecast"):
+        contributor = st.text_input("👤 Your name or handle", max_chars=40)
+        if st.form_submit_button(f"🏆 Submit to Leaderboard (RMSE {score['rmse']:.4f})", use_container_width=True):
+            try:
+                leaderboard_store().submit(contributor, model_choice, years_ahead, version,
+                                           score['rmse'], score['r2'])
+                st.success("✅ Submitted! See where you rank on the Leaderboard tab.")
+            except ValueError as e:
+                st.warning(str(e))
+    
     # CTA
     st.markdown("---")
     st.markdown("### 📸 Share Your Results!")
@@ -325,23 +409,36 @@ with tab3:
     st.markdown("### 🎯 How to Get on the Leaderboard")
     st.markdown("""
     1. **Run experiments** using our datasets
-    2. **Share your results** in the WhatsApp channel
+    2. **Submit your forecast** from the Live Forecast tab and share it in the WhatsApp channel
     3. **Top 3 contributors** get public credit monthly
     """)
     
     st.markdown("---")
-    st.markdown("### 🏅 Current Leaders (December 2025)")
-    
-    # Placeholder leaderboard
-    leaderboard_data = {
-        "Rank": ["🥇", "🥈", "🥉", "4", "5"],
-        "Contributor": ["[Open Slot]", "[Open Slot]", "[Open Slot]", "[Open Slot]", "[Open Slot]"],
-        "Experiments": ["-", "-", "-", "-", "-"],
-        "Accuracy": ["-", "-", "-", "-", "-"],
-        "Status": ["Available", "Available", "Available", "Available", "Available"]
-    }
-    
-    df_leaderboard = pd.DataFrame(leaderboard_data)
+    st.markdown("### 🏅 Current Leaders")
+    
+    # Scores are comparable only on the same data and horizon, so each pair has its own board
+    board_horizon = st.slider("📅 Forecast horizon (years)", 1, 30, 10, key="leaderboard_horizon")
+    st.caption("Rankings for the dataset currently loaded in the Live Forecast tab.")
+    
+    @st.cache_data(max_entries=64)
+    def leaderboard_view(store_version, dataset_version, years_ahead, k=5):
+        """Ranked table of the top k contributors on one board; rebuilt only after a new submission"""
+        leaders = leaderboard_store().top(dataset_version, years_ahead, k)
+        rows = []
+        for rank in range(k):
+            label = ["🥇", "🥈", "🥉"][rank] if rank < 3 else str(rank + 1)
+            if rank < len(leaders):
+                leader = leaders[rank]
+                rows.append({"Rank": label, "Contributor": leader['contributor'],
+                             "Experiments": str(leader['submissions']),
+                             "Accuracy": f"RMSE {leader['best_rmse']:.4f} ({leader['model']})",
+                             "Status": "Claimed"})
+            else:
+                rows.append({"Rank": label, "Contributor": "[Open Slot]", "Experiments": "-",
+                             "Accuracy": "-", "Status": "Available"})
+        return pd.DataFrame(rows)
+    
+    df_leaderboard = leaderboard_view(leaderboard_store().version(), version, board_horizon)
     st.dataframe(df_leaderboard, use_container_width=True, hide_index=True)
     
     st.markdown("---")
@@ -0,0 +1,199 @@
+"""
+NumPy-vectorized experiment generation
+Draws every field for a whole batch at once and only builds strings when records are serialized
+"""
+
+import json
+
+import numpy as np
+
+from climate_experiment_generator import SHARD_SIZE, ClimateExperimentGenerator
+
+# Record field order, matching ClimateExperimentGenerator._create_experiment
+FIELDS = [
+    'experiment_id', 'user_segment', 'region', 'climate_event', 'alert_channel',
+    'forecast_horizon', 'predicted_accuracy', 'lead_time_hours', 'recommended_action',
+    'hypothesis', 'success_metrics', 'sample_size', 'duration_days', 'cost_estimate_ngn',
+    'expected_roi', 'priority', 'data_sources', 'ml_model', 'validation_method'
+]
+
+# Fields kept as codes into a vocabulary until serialization
+LIST_FIELDS = ['success_metrics', 'data_sources']
+
+# Most items drawn for a list field
+MAX_SAMPLE = 4
+
+
+def _object_array(values):
+    table = np.empty(len(values), dtype=object)
+    table[:] = values
+    return table
+
+
+def _sample_codes(rng, size, available, width, min_k, max_k=MAX_SAMPLE):
+    """Codes of random k-samples of the first `available[i]` of `width` positions, k in [min_k, max_k]
+
+    Like random.sample, the positions come out in random order. Positions
+    p0, p1, ... are coded as the sum of (p_j + 1) * (width + 1) ** j.
+    """
+    keys = rng.random((size, width))
+    keys[np.arange(width) >= available[:, None]] = 2.0
+    k = rng.integers(min_k, max_k + 1, size)
+    picks = np.argsort(keys, axis=1)[:, :max_k]
+    digits = np.where(np.arange(max_k) < k[:, None], picks + 1, 0)
+    return (digits * (width + 1) ** np.arange(max_k)).sum(axis=1)
+
+
+def _sample_vocabulary(items, width, max_k=MAX_SAMPLE):
+    """The items of every sample code over `width` positions, as decoded from _sample_codes"""
+    base = width + 1
+    vocab = []
+    for code in range(base ** max_k):
+        picks = []
+        while code % base:
+            picks.append(code % base - 1)
+            code //= base
+        vocab.append(tuple(items[p] for p in picks if p < len(items)))
+    return vocab
+
+
+class VectorizedGenerator:
+    """Batch experiment generator backed by NumPy.
+
+    A batch is a dict of arrays keyed by field. experiment_id holds integer
+    IDs, the numeric measures hold their values, and every other field holds
+    integer codes into `self.vocabularies`: categoricals index their lists,
+    hypothesis indexes every (template, segment, event, channel, accuracy)
+    rendering, and success_metrics/data_sources index every ordered sample of
+    their items. Draws follow the same distributions as
+    ClimateExperimentGenerator, list order included.
+    """
+
+    def __init__(self, generator=None):
+        self.generator = generator or ClimateExperimentGenerator()
+        g = self.generator
+
+        self.choices = {
+            'user_segment': g.user_segments,
+            'region': g.regions,
+            'climate_event': g.climate_events,
+            'alert_channel': g.alert_channels,
+            'forecast_horizon': g.forecast_horizons,
+            'predicted_accuracy': g.accuracy_levels,
+            'lead_time_hours': g.lead_times,
+            'priority': g.priorities,
+            'ml_model': g.ml_models,
+            'validation_method': g.validation_methods
+        }
+
+        # Actions and metrics are flattened across segments, addressed by per-segment offsets
+        self.action_counts = np.array([len(g.actions[s]) for s in g.user_segments])
+        self.action_offsets = np.concatenate([[0], np.cumsum(self.action_counts)[:-1]])
+        self.metric_counts = np.array([len(g.metrics_map[s]) for s in g.user_segments])
+        self.metric_width = int(self.metric_counts.max())
+
+        vocab = {field: list(values) for field, values in self.choices.items()}
+        vocab['recommended_action'] = [a for s in g.user_segments for a in g.actions[s]]
+        vocab['hypothesis'] = list(g.hypotheses.values())
+        vocab['success_metrics'] = [
+            sample for segment in g.user_segments
+            for sample in _sample_vocabulary(g.metrics_map[segment], self.metric_width)
+        ]
+        vocab['data_sources'] = _sample_vocabulary(g.data_sources, len(g.data_sources))
+        self.vocabularies = vocab
+        self._tables = {field: _object_array(values) for field, values in vocab.items()}
+        # Each code's `"field": value` JSON fragment, rendered once
+        self._fragments = {
+            field: _object_array([f'"{field}": ' + json.dumps(list(v) if field in LIST_FIELDS else v)
+                                  for v in values])
+            for field, values in vocab.items()
+        }
+
+    def generate_batch(self, size, start_id=1, rng=None):
+        """Draw all columns for `size` experiments numbered from start_id"""
+        rng = rng if rng is not None else np.random.default_rng()
+        g = self.generator
+        batch = {'experiment_id': np.arange(start_id, start_id + size, dtype=np.int64)}
+
+        for field, values in self.choices.items():
+            batch[field] = rng.integers(0, len(values), size, dtype=np.int16)
+
+        segment = batch['user_segment']
+        batch['recommended_action'] = (
+            self.action_offsets[segment]
+            + (rng.random(size) * self.action_counts[segment]).astype(np.int64)
+        )
+
+        template = rng.integers(0, len(g.hypothesis_templates), size)
+        hypothesis = template
+        for field, values in [('user_segment', g.user_segments), ('climate_event', g.climate_events),
+                              ('alert_channel', g.alert_channels), ('predicted_accuracy', g.accuracy_levels)]:
+            hypothesis = hypothesis * len(values) + batch[field]
+        batch['hypothesis'] = hypothesis
+
+        metrics = _sample_codes(rng, size, self.metric_counts[segment], self.metric_width, 2)
+        batch['success_metrics'] = segment.astype(np.int64) * (self.metric_width + 1) ** MAX_SAMPLE + metrics
+        sources = len(g.data_sources)
+        batch['data_sources'] = _sample_codes(rng, size, np.full(size, sources), sources, 2)
+
+        batch['sample_size'] = rng.integers(50, 5001, size)
+        batch['duration_days'] = rng.integers(7, 91, size)
+        batch['cost_estimate_ngn'] = rng.integers(50000, 2000001, size)
+        batch['expected_roi'] = np.rint(rng.uniform(1.5, 5.0, size) * 100) / 100
+        return batch
+
+    def iter_batches(self, num_experiments=500, seed=None, batch_size=SHARD_SIZE, first_id=1):
+        """Yield batches, each drawn from a generator seeded by (seed, batch number)
+
+        Batches of an appended run (first_id > 1) also mix in first_id, so
+        they don't repeat the draws of the original run.
+        """
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2 ** 32)
+        for shard, start in enumerate(range(0, num_experiments, batch_size)):
+            entropy = [seed, shard] if first_id == 1 else [seed, first_id, shard]
+            rng = np.random.default_rng(entropy)
+            yield self.generate_batch(min(batch_size, num_experiments - start), first_id + start, rng)
+
+    def columns(self, batch):
+        """Batch columns in record field order for ExperimentStore.append_columns
+
+        Coded fields stay codes into `self.vocabularies`; only the
+        experiment IDs are rendered as strings.
+        """
+        columns = {field: batch[field] for field in FIELDS}
+        columns['experiment_id'] = list(map('EXP_{:04d}'.format, batch['experiment_id'].tolist()))
+        return columns
+
+    def encode_json(self, batch):
+        """One JSON object string per experiment, identical to json.dumps of its record
+
+        Coded fields are looked up in per-field tables of pre-rendered
+        fragments, so no record dicts are built.
+        """
+        parts = []
+        for field in FIELDS:
+            column = batch[field]
+            if field == 'experiment_id':
+                parts.append(map('"experiment_id": "EXP_{:04d}"'.format, column.tolist()))
+            elif field in self._fragments:
+                parts.append(self._fragments[field][column].tolist())
+            else:
+                # repr matches json.dumps for ints and finite floats
+                parts.append(map(f'"{field}": {{!r}}'.format, column.tolist()))
+        return ['{' + ', '.join(row) + '}' for row in zip(*parts)]
+
+    def materialize(self, batch):
+        """Turn a batch into experiment dicts"""
+        columns = []
+        for field in FIELDS:
+            if field == 'experiment_id':
+                values = [f'EXP_{i:04d}' for i in batch[field].tolist()]
+            elif field in self._tables:
+                values = self._tables[field][batch[field]].tolist()
+                if field in LIST_FIELDS:
+                    values = [list(v) for v in values]
+            else:
+                values = batch[field].tolist()
+            columns.append(values)
+        return [dict(zip(FIELDS, row)) for row in zip(*columns)]